@@ -0,0 +1,229 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+from indicators import TIE, as_codes, indicator_columns
+from strategy import DEFAULT_PARAMS, Strategy, simulate_batch
+
+
+# Memory-mapped archive of recorded shoes for research runs.
+#
+# shoes.i8 holds one fixed-width row of int8 result codes per shoe, padded
+# with ties, so shoe k starts at byte k * width and a run of shoes is one
+# contiguous 2-D block. index.bin holds one INDEX_DTYPE record per row (table,
+# date, shoe id, length); shoe ids are stored as text, since CSV files number
+# their shoes with ints or strings alike. Both files are memory-mapped: a
+# query filters the small index and only the pages of the selected rows are
+# ever read, and views of the rows go to the batch indicator and strategy
+# functions without copying.
+# Every indicator column and the strategy only look back, so the padding
+# never changes the values of a shoe's real rounds.
+
+INDEX_DTYPE = np.dtype([('table', 'S8'), ('date', '<M8[D]'), ('shoe', 'S16'), ('length', '<i2')])
+
+# Longest shoe an archive created with the default width can hold; an
+# eight-deck shoe rarely has more than 85 rounds
+DEFAULT_WIDTH = 96
+
+_VERSION = 2
+
+
+class ShoeArchive:
+    def __init__(self, directory, width=DEFAULT_WIDTH):
+        self.directory = directory
+        meta_path = os.path.join(directory, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') != _VERSION:
+                raise ValueError(f"{directory}: unsupported archive version {meta.get('version')!r}")
+            self.width = meta['width']
+        else:
+            os.makedirs(directory, exist_ok=True)
+            self.width = width
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': _VERSION, 'width': width}, f)
+        self.data_path = os.path.join(directory, 'shoes.i8')
+        self.index_path = os.path.join(directory, 'index.bin')
+        self._map()
+
+    # (Re)map both files. Only rows with an index record count; a data tail
+    # left by an interrupted append is ignored and overwritten by the next one.
+    def _map(self):
+        size = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        n = size // INDEX_DTYPE.itemsize
+        if n:
+            self.index = np.memmap(self.index_path, dtype=INDEX_DTYPE, mode='r', shape=(n,))
+            self.data = np.memmap(self.data_path, dtype=np.int8, mode='r', shape=(n, self.width))
+        else:
+            self.index = np.empty(0, dtype=INDEX_DTYPE)
+            self.data = np.empty((0, self.width), dtype=np.int8)
+
+    def __len__(self):
+        return len(self.index)
+
+    # Append shoes given as (table, date, shoe_id, results) with results as
+    # names, P/B/T letters or codes, `chunk` shoes per write; returns their
+    # row numbers
+    def append(self, shoes, chunk=65536):
+        first = len(self)
+        rows, records = [], []
+        for table, date, shoe_id, results in shoes:
+            codes = as_codes(results)
+            if not 0 < len(codes) <= self.width:
+                raise ValueError(f"shoe {shoe_id!r} has {len(codes)} rounds; this archive holds 1 to {self.width}")
+            table = _field(table, 'table', 'table name')
+            shoe = _field(shoe_id, 'shoe', 'shoe id')
+            row = np.full(self.width, TIE, dtype=np.int8)
+            row[:len(codes)] = codes
+            rows.append(row)
+            records.append((table, np.datetime64(date, 'D'), shoe, len(codes)))
+            if len(rows) == chunk:
+                self._write(rows, records)
+                rows, records = [], []
+        if rows:
+            self._write(rows, records)
+        return np.arange(first, len(self))
+
+    def _write(self, rows, records):
+        start = len(self)
+        # Data first, then the index records that make the rows visible
+        with open(self.data_path, 'ab') as f:
+            f.truncate(start * self.width)
+            f.write(np.stack(rows).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.index_path, 'ab') as f:
+            f.write(np.array(records, dtype=INDEX_DTYPE).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self._map()
+
+    # Row numbers of the shoes of `table` (or all tables) dated in
+    # [start, end); dates may be 'YYYY-MM-DD' strings, dates or datetime64
+    def select(self, table=None, start=None, end=None):
+        mask = np.ones(len(self), dtype=bool)
+        if table is not None:
+            mask &= self.index['table'] == str(table).encode()
+        if start is not None:
+            mask &= self.index['date'] >= np.datetime64(start, 'D')
+        if end is not None:
+            mask &= self.index['date'] < np.datetime64(end, 'D')
+        return np.flatnonzero(mask)
+
+    # Result codes of one shoe, a view into the mapped file
+    def shoe(self, row):
+        return self.data[row, :self.index['length'][row]]
+
+    # Padded codes and lengths of `rows`: a view when the rows are
+    # consecutive, otherwise a copy of just those rows
+    def rows(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) and (np.diff(rows) == 1).all():
+            block = slice(int(rows[0]), int(rows[-1]) + 1)
+            return self.data[block], np.asarray(self.index['length'][block])
+        return self.data[rows], np.asarray(self.index['length'][rows])
+
+    # (rows, codes, lengths) for `rows` in batches of at most `batch_size`
+    def batches(self, rows, batch_size=4096):
+        rows = np.asarray(rows, dtype=np.int64)
+        for start in range(0, len(rows), batch_size):
+            part = rows[start:start + batch_size]
+            yield (part,) + self.rows(part)
+
+    # Strategy outcome per selected shoe: bankroll after its last round, the
+    # lowest bankroll on the way and the number of bets placed on its rounds
+    def run_strategy(self, rows, params=DEFAULT_PARAMS, batch_size=4096):
+        final, lowest, bets = [], [], []
+        for _, codes, lengths in self.batches(rows, batch_size):
+            columns = indicator_columns(codes, rsi_window=params.rsi_window)
+            decisions, _, bankroll = simulate_batch(codes, columns, params)
+            rounds = np.arange(self.width)
+            valid = rounds < lengths[:, None]
+            final.append(bankroll[np.arange(len(codes)), lengths - 1])
+            lowest.append(np.where(valid, bankroll, np.inf).min(axis=1))
+            # A decision bets on the next round, so the last one has nothing to bet on
+            bets.append(((decisions != 0) & (rounds < lengths[:, None] - 1)).sum(axis=1))
+        if not final:
+            return {'final': np.empty(0), 'lowest': np.empty(0), 'bets': np.empty(0, dtype=np.int64)}
+        return {'final': np.concatenate(final), 'lowest': np.concatenate(lowest), 'bets': np.concatenate(bets)}
+
+
+# `value` as the bytes of the fixed-width index field `name`
+def _field(value, name, what):
+    data = str(value).encode()
+    if len(data) > INDEX_DTYPE[name].itemsize:
+        raise ValueError(f"{what} {str(value)!r} is longer than {INDEX_DTYPE[name].itemsize} bytes")
+    return data
+
+
+# (shoe_id, results) pairs of a road text file (one shoe) or a CSV/Parquet file
+def _read_shoes(path, shoe_column, result_column):
+    if path.endswith('.txt'):
+        from ingest import parse_road
+
+        with open(path, encoding='latin-1') as f:
+            return [(0, parse_road(f.read()))]
+    from backtest import iter_shoes
+
+    return iter_shoes(path, shoe_column, result_column)
+
+
+def _date_range(args):
+    if args.month:
+        start = np.datetime64(args.month, 'M')
+        return start.astype('M8[D]'), (start + 1).astype('M8[D]')
+    return args.start, args.end
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory-mapped archive of recorded shoes.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help="append the shoes of a file")
+    add.add_argument('archive')
+    add.add_argument('file', help="road text file (.txt) with one shoe, or CSV/Parquet with many")
+    add.add_argument('--table', required=True)
+    add.add_argument('--date', required=True, help="YYYY-MM-DD")
+    add.add_argument('--shoe-column', default='shoe')
+    add.add_argument('--result-column', default='result')
+    add.add_argument('--width', type=int, default=DEFAULT_WIDTH, help="row width when creating the archive")
+
+    query = commands.add_parser('query', help="run the strategy over a selection of shoes")
+    query.add_argument('archive')
+    query.add_argument('--table')
+    query.add_argument('--start', help="first date, YYYY-MM-DD")
+    query.add_argument('--end', help="date after the last one, YYYY-MM-DD")
+    query.add_argument('--month', help="YYYY-MM, instead of --start/--end")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'add':
+            archive = ShoeArchive(args.archive, args.width)
+            shoes = _read_shoes(args.file, args.shoe_column, args.result_column)
+            added = archive.append((args.table, args.date, shoe_id, results) for shoe_id, results in shoes)
+            print(f"added {len(added)} shoes; {len(archive)} in {args.archive}")
+            return
+
+        archive = ShoeArchive(args.archive)
+        start, end = _date_range(args)
+        rows = archive.select(args.table, start, end)
+    except ValueError as e:
+        parser.error(str(e))
+    outcomes = archive.run_strategy(rows)
+    final = outcomes['final']
+    print(f"shoes              {len(rows)}")
+    print(f"rounds             {int(archive.index['length'][rows].sum())}")
+    if len(rows):
+        initial = Strategy(DEFAULT_PARAMS).B
+        print(f"bets               {int(outcomes['bets'].sum())}")
+        print(f"final bankroll     mean {final.mean():.2f} | median {np.median(final):.2f} | "
+              f"min {final.min():.2f} | max {final.max():.2f}")
+        print(f"net P&L            {(final - initial).sum():.2f}")
+        print(f"lowest bankroll    {outcomes['lowest'].min():.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from indicators import BANKER, PLAYER, encode_results
+from strategy import DEFAULT_PARAMS, strategy_columns_many
+
+
+# Read one CSV/Parquet file in chunks and yield (shoe_id, results) per shoe.
+# Rounds of a shoe must be contiguous; a file without the shoe column is
+# treated as a single shoe.
+def iter_shoes(path, shoe_column='shoe', result_column='result', chunksize=200_000):
+    if path.endswith('.parquet'):
+        chunks = _parquet_chunks(path, chunksize)
+    else:
+        chunks = pd.read_csv(path, chunksize=chunksize)
+
+    current_id, pending = None, []
+    for chunk in chunks:
+        results = chunk[result_column].astype(str).str.strip().to_numpy()
+        if shoe_column not in chunk.columns:
+            ids = np.zeros(len(chunk), dtype=np.int64)
+        else:
+            ids = chunk[shoe_column].to_numpy()
+
+        # Split the chunk wherever the shoe id changes
+        breaks = np.flatnonzero(ids[1:] != ids[:-1]) + 1
+        for part_ids, part in zip(np.split(ids, breaks), np.split(results, breaks)):
+            if len(part) == 0:
+                continue
+            if pending and part_ids[0] != current_id:
+                yield current_id, np.concatenate(pending)
+                pending = []
+            current_id = part_ids[0]
+            pending.append(part)
+    if pending:
+        yield current_id, np.concatenate(pending)
+
+
+def _parquet_chunks(path, chunksize):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        sys.exit("Reading Parquet files requires pyarrow (pip install pyarrow)")
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+        yield batch.to_pandas()
+
+
+# Per-shoe outcome of the strategy: bets placed/won/lost, final bankroll and
+# the largest peak-to-trough fall of the bankroll
+def shoe_summary(codes, columns):
+    decisions = np.asarray(columns['next_rd_decision'])
+    bankroll = np.concatenate([[DEFAULT_PARAMS.initial_bankroll], columns['profit']])
+
+    # A decision is settled by the next round's result; ties push
+    bet = decisions[:-1] != 'No Bet'
+    following = codes[1:]
+    settled = bet & ((following == PLAYER) | (following == BANKER))
+    won = settled & (((decisions[:-1] == 'Player') & (following == PLAYER)) |
+                     ((decisions[:-1] == 'Banker') & (following == BANKER)))
+
+    return {
+        'rounds': len(codes),
+        'bets': int(settled.sum()),
+        'won': int(won.sum()),
+        'lost': int(settled.sum() - won.sum()),
+        'final_bankroll': float(bankroll[-1]),
+        'max_drawdown': float((np.maximum.accumulate(bankroll) - bankroll).max()),
+    }
+
+
+# Backtest (shoe_id, results) pairs in batches so equal-length shoes share
+# their indicator pass; yields (shoe_id, summary) in input order
+def backtest_shoes(shoes, batch_size=2000):
+    batch = []
+    for shoe_id, results in shoes:
+        batch.append((shoe_id, encode_results(results)))
+        if len(batch) == batch_size:
+            yield from _backtest_batch(batch)
+            batch = []
+    if batch:
+        yield from _backtest_batch(batch)
+
+
+def _backtest_batch(batch):
+    codes = [shoe for _, shoe in batch]
+    for (shoe_id, shoe), columns in zip(batch, strategy_columns_many(codes)):
+        yield shoe_id, shoe_summary(shoe, columns)
+
+
+def summarize(rows):
+    if not rows:
+        return "shoes              0"
+    df = pd.DataFrame(rows)
+    final = df['final_bankroll']
+    start = DEFAULT_PARAMS.initial_bankroll
+    lines = [
+        f"shoes              {len(df)}",
+        f"rounds             {df['rounds'].sum()}",
+        f"bets               {df['bets'].sum()} (won {df['won'].sum()}, lost {df['lost'].sum()})",
+        f"final bankroll     mean {final.mean():.2f} | median {final.median():.2f} | "
+        f"min {final.min():.2f} | max {final.max():.2f}",
+        f"net P&L            {(final - start).sum():.2f}",
+        f"shoes up / down    {(final > start).sum()} / {(final < start).sum()}",
+        f"max drawdown       mean {df['max_drawdown'].mean():.2f} | worst {df['max_drawdown'].max():.2f}",
+    ]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest the bounce/slope strategy over recorded shoes.")
+    parser.add_argument('files', nargs='+', help="CSV or Parquet files, one row per round")
+    parser.add_argument('--shoe-column', default='shoe', help="column identifying the shoe (default: shoe)")
+    parser.add_argument('--result-column', default='result', help="column with Player/Banker/Tie or P/B/T (default: result)")
+    parser.add_argument('--per-shoe', metavar='CSV', help="also write per-shoe results to this CSV file")
+    args = parser.parse_args(argv)
+
+    rows = []
+    for path in args.files:
+        shoes = iter_shoes(path, args.shoe_column, args.result_column)
+        for shoe_id, row in backtest_shoes(shoes):
+            row['file'] = path
+            row['shoe'] = shoe_id
+            rows.append(row)
+
+    print(summarize(rows))
+    if args.per_shoe:
+        pd.DataFrame(rows).to_csv(args.per_shoe, index=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from engine import GameEngine
+from history import history_page
+from indicators import decode_results, random_shoes
+from reference import compare_frames, reference_frame
+from strategy import run_strategy
+
+
+SHOE_LENGTHS = (80, 300, 1000, 10000)
+
+
+# What one click costs in the app: push the round and build the first page
+# of the history table
+def _click(engine, winner):
+    engine.push(winner)
+    history_page(engine.store)
+
+
+# Per-click latencies in seconds for playing `names` into a fresh engine
+def click_latencies(names):
+    engine = GameEngine()
+    latencies = np.empty(len(names))
+    clock = time.perf_counter
+    for i, winner in enumerate(names):
+        start = clock()
+        _click(engine, winner)
+        latencies[i] = clock() - start
+    return latencies
+
+
+def _play_engine(names):
+    engine = GameEngine()
+    for winner in names:
+        engine.push(winner)
+    return engine
+
+
+# Whole-shoe paths, each returning the game frame it produced
+PATHS = {
+    'engine': lambda codes, names: _play_engine(names).to_frame(),
+    'bulk': lambda codes, names: GameEngine.from_results(codes).to_frame(),
+    'batch': lambda codes, names: run_strategy(codes),
+    'reference': lambda codes, names: reference_frame(codes),
+}
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    value = fn(*args)
+    return value, time.perf_counter() - start
+
+
+def _peak_bytes(fn, *args):
+    tracemalloc.start()
+    try:
+        fn(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+# Benchmark `shoes` seeded synthetic shoes of every length. The reference
+# implementation replays the whole frame on every click, so it only runs for
+# lengths up to `reference_max`; the other paths are checked against it there
+# and against each other everywhere.
+def run_bench(lengths=SHOE_LENGTHS, shoes=3, seed=0, reference_max=80):
+    rows = []
+    for rounds in lengths:
+        paths = [name for name in PATHS if name != 'reference' or rounds <= reference_max]
+        latencies, seconds, peaks, mismatches = [], dict.fromkeys(paths, 0.0), {}, []
+        for k, codes in enumerate(random_shoes(shoes, rounds, seed=(seed, rounds))):
+            names = decode_results(codes).tolist()
+            latencies.append(click_latencies(names))
+
+            frames = {}
+            for name in paths:
+                frames[name], elapsed = _timed(PATHS[name], codes, names)
+                seconds[name] += elapsed
+            expected = frames.get('reference', frames['batch'])
+            for name, frame in frames.items():
+                for column in compare_frames(frame, expected):
+                    mismatches.append(f'shoe {k}: {name} {column}')
+
+            if k == 0:
+                for name in paths:
+                    peaks[name] = _peak_bytes(PATHS[name], codes, names)
+
+        latencies = np.concatenate(latencies)
+        row = {
+            'rounds': rounds,
+            'shoes': shoes,
+            'click_p50_us': np.percentile(latencies, 50) * 1e6,
+            'click_p99_us': np.percentile(latencies, 99) * 1e6,
+        }
+        for name in PATHS:
+            row[f'{name}_rounds_per_s'] = rounds * shoes / seconds[name] if name in seconds else None
+        for name in PATHS:
+            row[f'{name}_peak_kib'] = peaks[name] / 1024 if name in peaks else None
+        row['identical'] = not mismatches
+        row['mismatches'] = mismatches
+        rows.append(row)
+    return rows
+
+
+def _format(rows):
+    columns = [('rounds', 'rounds', '{:d}'), ('click_p50_us', 'p50 us', '{:.1f}'),
+               ('click_p99_us', 'p99 us', '{:.1f}')]
+    columns += [(f'{name}_rounds_per_s', f'{name} r/s', '{:,.0f}') for name in PATHS]
+    columns += [(f'{name}_peak_kib', f'{name} KiB', '{:,.0f}') for name in PATHS]
+    columns += [('identical', 'identical', '{}')]
+    table = [[title for _, title, _ in columns]]
+    for row in rows:
+        table.append(['-' if row[key] is None else fmt.format(row[key]) for key, _, fmt in columns])
+    widths = [max(len(line[i]) for line in table) for i in range(len(columns))]
+    return '\n'.join('  '.join(cell.rjust(width) for cell, width in zip(line, widths)) for line in table)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the per-click and whole-shoe paths on seeded synthetic shoes.")
+    parser.add_argument('--lengths', type=lambda s: [int(n) for n in s.split(',')], default=list(SHOE_LENGTHS),
+                        help="comma separated shoe lengths (default: %(default)s)")
+    parser.add_argument('--shoes', type=int, default=3, help="shoes per length")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--reference-max', type=int, default=80,
+                        help="longest shoe to run the (quadratic) reference implementation on")
+    parser.add_argument('--json', metavar='PATH', help="also write the results as JSON")
+    parser.add_argument('--max-p99-us', type=float, help="fail if any click p99 latency exceeds this")
+    args = parser.parse_args(argv)
+
+    rows = run_bench(args.lengths, args.shoes, args.seed, args.reference_max)
+    print(_format(rows))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(rows, f, indent=2)
+
+    failed = False
+    for row in rows:
+        for mismatch in row['mismatches']:
+            print(f"{row['rounds']} rounds, {mismatch}: differs from the reference", file=sys.stderr)
+            failed = True
+        if args.max_p99_us is not None and row['click_p99_us'] > args.max_p99_us:
+            print(f"{row['rounds']} rounds: click p99 {row['click_p99_us']:.1f} us exceeds {args.max_p99_us} us",
+                  file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,41 @@
+import threading
+from collections import OrderedDict
+
+
+# Bounded LRU cache of per-round views of a game (history pages, what-if
+# trees), keyed by game, strategy parameters and the digest of the result
+# prefix, so a view is built at most once per round. It is shared by all
+# sessions of the process (Streamlit runs them in threads), so it is guarded
+# by a lock.
+class IndicatorCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def _put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    # Value built by `build()` for the current result prefix of `engine`, e.g.
+    # a history page; rebuilt only when a round was added
+    def view(self, game, engine, key, build):
+        key = ('view', game, engine.params, engine.digest) + tuple(key)
+        value = self._get(key)
+        if value is None:
+            value = build()
+            self._put(key, value)
+        return value
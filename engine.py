@@ -0,0 +1,199 @@
+import copy
+import hashlib
+import math
+import time
+
+import numpy as np
+
+from indicators import (BANKER, PLAYER, RESULT_CODES, RESULT_NAMES, TIE, RollingRSI, SupportResistance,
+                        Transitions, as_codes, slope, support_resistance, transition_columns)
+from metrics import metrics
+from store import DECISION_NAMES, GameStore
+from strategy import DEFAULT_PARAMS, Lookback, Strategy, simulate
+
+
+# Chain the digest of a result prefix with the next result, so every prefix of
+# a shoe has its own key without rehashing the whole history
+def chain_digest(digest, result):
+    return hashlib.blake2b(digest + result.encode(), digest_size=16).digest()
+
+
+# Stages timed by push() when metrics are enabled
+_STAGES = ('transitions', 'indicators', 'strategy', 'store')
+
+
+# Stateful per-game engine: every call to push() appends exactly one round and
+# updates all running counters, so a click costs O(1) instead of a full replay.
+# The rows it produces match what update_result used to rebuild from scratch.
+# History goes to a compact GameStore; the float64 values the strategy reads
+# back are kept in short lookback windows, so decisions never see float32.
+class GameEngine:
+    def __init__(self, params=DEFAULT_PARAMS, game=None):
+        self.params = params
+        self.store = GameStore(game)
+        self.digest = b''
+        self.recent = Lookback.columns(params)
+
+        # Cumulative Wins/Losses, transition counts and proportions
+        self.transitions = Transitions()
+
+        self.rsi_p3 = RollingRSI(params.rsi_window, decimals=1)
+        self.rsi_p4 = RollingRSI(params.rsi_window, decimals=1)
+
+        self.support_resistance = SupportResistance()
+
+        self.strategy = Strategy(params)
+
+    # Engine for a whole result sequence, built in bulk: the batch kernels fill
+    # the indicator columns, the state machine runs once over them, and the
+    # running state is set from the last rows. Identical to pushing the
+    # results one by one.
+    @classmethod
+    def from_results(cls, results, params=DEFAULT_PARAMS, game=None):
+        engine = cls(params, game)
+        codes = as_codes(results)
+        n = len(codes)
+        if n == 0:
+            return engine
+        with metrics.timer(game, 'bulk_build', n):
+            engine._build(codes)
+        return engine
+
+    # Fill a fresh engine from a non-empty array of result codes
+    def _build(self, codes):
+        n = len(codes)
+        names = RESULT_NAMES[codes].tolist()
+
+        columns = transition_columns(codes)
+        self.transitions = Transitions.from_columns(codes, columns)
+        proportions = [columns[f'proportion_{k}'].tolist() for k in range(1, 5)]
+        # The streaming RSI keeps its exact rolling sums for the rounds to come
+        columns['rsi_p3'] = np.array([self.rsi_p3.push(value) for value in proportions[2]])
+        columns['rsi_p4'] = np.array([self.rsi_p4.push(value) for value in proportions[3]])
+        cumulative = columns['Cumulative Wins/Losses']
+        columns['support'], columns['resistance'] = support_resistance(cumulative)
+        self.support_resistance = SupportResistance.from_values(cumulative)
+        columns['slope_p3'] = slope(columns['proportion_3'], offset=2)
+        columns['slope_p4'] = slope(columns['proportion_4'], offset=2)
+        columns['slope_p3_5'] = slope(columns['proportion_3'], offset=5)
+        columns['slope_p4_5'] = slope(columns['proportion_4'], offset=5)
+
+        cols = {name: values.tolist() for name, values in columns.items()}
+        decisions, bet_sizes, bankroll = simulate(names, cols, self.params, strategy=self.strategy)
+        columns['result'] = codes
+        columns['next_rd_decision'] = decisions
+        columns['下注'] = bet_sizes
+        columns['profit'] = bankroll
+        self.store.extend(columns)
+
+        for name, values in self.recent.items():
+            for value in cols[name][-values.values.maxlen:]:
+                values.append(value)
+            values.count = n
+        for name in names:
+            self.digest = chain_digest(self.digest, name)
+
+    def __len__(self):
+        return len(self.store)
+
+    @property
+    def bankroll(self):
+        return self.strategy.B
+
+    def result_counts(self):
+        counts = np.bincount(self.store.column('result'), minlength=3)
+        return {"Player": int(counts[PLAYER]), "Banker": int(counts[BANKER]), "Tie": int(counts[TIE])}
+
+    def proportions(self):
+        return {f'proportion_{k + 1}': value for k, value in enumerate(self.transitions.proportions)}
+
+    # What a session shows for this table, besides the history
+    def state(self):
+        decisions = self.store.column('next_rd_decision')
+        return {
+            'round_num': len(self) + 1,
+            'cumulative_wins': self.result_counts(),
+            'proportions': self.proportions(),
+            'profit': self.bankroll if len(self) else 0,
+            'next_rd_decision': DECISION_NAMES[decisions[-1]] if len(decisions) else None,
+            'digest': self.digest.hex(),
+        }
+
+    # Advance the running state by one result and return its row without
+    # storing it. With a `times` list, the end of each stage is appended to it.
+    def step(self, result, times=None):
+        i = self.transitions.count
+        self.digest = chain_digest(self.digest, result)
+
+        # --- 1. Cumulative wins/losses, transition pattern and proportions ---
+        cumulative, new_column, proportions = self.transitions.push(RESULT_CODES[result])
+        if times is not None:
+            times.append(time.perf_counter())
+
+        # --- 2. RSI, slopes and support/resistance ---
+        recent = self.recent
+        p3, p4 = recent['proportion_3'], recent['proportion_4']
+        support, resistance = self.support_resistance.push(cumulative)
+        row = {
+            'round_num': i + 1,
+            'result': result,
+            'new_column': new_column,
+            'proportion_1': proportions[0],
+            'proportion_2': proportions[1],
+            'proportion_3': proportions[2],
+            'proportion_4': proportions[3],
+            'Cumulative Wins/Losses': cumulative,
+            'rsi_p3': self.rsi_p3.push(proportions[2]),
+            'rsi_p4': self.rsi_p4.push(proportions[3]),
+            'support': support,
+            'resistance': resistance,
+            'slope_p3': (proportions[2] - p3[i - 2]) / 2 if i >= 2 else math.nan,
+            'slope_p4': (proportions[3] - p4[i - 2]) / 2 if i >= 2 else math.nan,
+            'slope_p3_5': (proportions[2] - p3[i - 5]) / 5 if i >= 5 else math.nan,
+            'slope_p4_5': (proportions[3] - p4[i - 5]) / 5 if i >= 5 else math.nan,
+        }
+        for name, values in recent.items():
+            values.append(row[name])
+        if times is not None:
+            times.append(time.perf_counter())
+
+        # --- 3. Bounce/slope strategy for the next round ---
+        row['next_rd_decision'] = self.strategy.step(i, result, recent)
+        row['下注'] = float(self.strategy.bet_size)
+        row['profit'] = float(self.strategy.B)
+        if times is not None:
+            times.append(time.perf_counter())
+        return row
+
+    def push(self, result):
+        # Per-stage timings only when metrics are switched on
+        if not metrics.enabled:
+            row = self.step(result)
+            self.store.append(row)
+            return row
+
+        times = [time.perf_counter()]
+        row = self.step(result, times)
+        self.store.append(row)
+        times.append(time.perf_counter())
+        game = self.store.game
+        for stage, start, end in zip(_STAGES, times, times[1:]):
+            metrics.record(game, stage, end - start)
+        return row
+
+    # Snapshot of the running state for rounds that may never happen. The
+    # fork shares this engine's store, which step() never writes, and copies
+    # only the small running state; use step() on it, not push().
+    def fork(self):
+        clone = copy.copy(self)
+        clone.recent = {name: values.copy() for name, values in self.recent.items()}
+        clone.transitions = self.transitions.copy()
+        clone.rsi_p3 = self.rsi_p3.copy()
+        clone.rsi_p4 = self.rsi_p4.copy()
+        clone.support_resistance = self.support_resistance.copy()
+        clone.strategy = copy.copy(self.strategy)
+        return clone
+
+    # DataFrame of rounds [start, stop), materialized from the store
+    def to_frame(self, start=0, stop=None):
+        return self.store.to_frame(start, stop)
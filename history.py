@@ -0,0 +1,31 @@
+import math
+
+# Columns shown in the history table and their short display names
+DISPLAY_COLUMNS = {
+    'round_num': '轮',
+    'result': '结果',
+    'next_rd_decision': '决策',
+    '下注': '下注',
+    'profit': 'Bank',
+    'rsi_p3': 'RSIP3',
+    'rsi_p4': 'RSIP4',
+    'support': 'S',
+    'resistance': 'R',
+    'Cumulative Wins/Losses': 'W/L',
+}
+
+PAGE_SIZES = [25, 50, 100, 200]
+
+
+def page_count(rounds, page_size):
+    return max(1, math.ceil(rounds / page_size))
+
+
+# One page of a game's history, newest round first. Page 0 holds the latest
+# `page_size` rounds; only those rows are read from the store, so the cost
+# does not grow with the length of the session.
+def history_page(store, page=0, page_size=50):
+    stop = max(len(store) - page * page_size, 0)
+    start = max(stop - page_size, 0)
+    df = store.to_frame(start, stop, columns=list(DISPLAY_COLUMNS))
+    return df.rename(columns=DISPLAY_COLUMNS).iloc[::-1].reset_index(drop=True)
@@ -0,0 +1,63 @@
+import argparse
+import os
+import subprocess
+import sys
+
+
+# Import cost of `module` in a fresh interpreter, from `python -X importtime`.
+# Modules in `preload` are imported first and left out, so their cost (e.g.
+# streamlit, which `streamlit run` has always loaded) does not hide ours.
+# Returns (name, self_us, cumulative_us, depth) rows in import order.
+def import_times(module, preload=()):
+    code = ''.join(f'import {name}\n' for name in preload) + f'import {module}\n'
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    if proc.returncode:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    rows, pending = [], set(preload)
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if pending:
+            if depth == 0:
+                pending.discard(name)
+            continue
+        rows.append((name, int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def report(module, preload=(), top=15):
+    rows = import_times(module, preload)
+    total = sum(cumulative for _, _, cumulative, depth in rows if depth == 0)
+    lines = [f'import {module}: {total / 1000:.1f} ms, {len(rows)} modules'
+             + (f" (after {', '.join(preload)})" if preload else '')]
+    for name, self_us, cumulative_us, _ in sorted(rows, key=lambda row: -row[1])[:top]:
+        lines.append(f'  {self_us / 1000:8.2f} ms self  {cumulative_us / 1000:8.2f} ms cumulative  {name}')
+    return '\n'.join(lines)
+
+
+def _available(names):
+    return [name for name in names if subprocess.run([sys.executable, '-c', f'import {name}'],
+                                                     capture_output=True).returncode == 0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report what importing the app's modules costs at startup.")
+    parser.add_argument('modules', nargs='*', default=['ui'], help="modules to measure (default: %(default)s)")
+    parser.add_argument('--preload', default='numpy,pandas,streamlit',
+                        help="comma separated modules loaded before and left out (default: %(default)s; "
+                             "those that are not installed are skipped)")
+    parser.add_argument('--top', type=int, default=15, help="slowest modules to list")
+    args = parser.parse_args(argv)
+
+    preload = _available([name for name in args.preload.split(',') if name])
+    for module in args.modules:
+        print(report(module, preload, args.top))
+
+
+if __name__ == '__main__':
+    main()
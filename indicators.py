@@ -0,0 +1,445 @@
+import copy
+import math
+
+import numpy as np
+import pandas as pd
+from pandas.api.indexers import BaseIndexer
+
+
+# int8 codes for round results
+TIE, PLAYER, BANKER = 0, 1, 2
+RESULT_CODES = {'Tie': TIE, 'Player': PLAYER, 'Banker': BANKER}
+RESULT_NAMES = np.array(['Tie', 'Player', 'Banker'], dtype=object)
+
+# Long-run frequency of each result code in an eight-deck shoe
+RESULT_PROBABILITIES = (0.0952, 0.4462, 0.4586)
+
+# new_column code indexed by [previous non-tie result, current result]:
+# 1=P after B, 2=B after P, 3=BB, 4=PP
+_TRANSITIONS = np.array([
+    [0, 0, 0],
+    [0, 4, 2],
+    [0, 1, 3],
+], dtype=np.int8)
+
+
+# Code of every form a result can take: its name, its P/B/T initial or the
+# int code itself
+_ENCODING = {**RESULT_CODES, 'T': TIE, 'P': PLAYER, 'B': BANKER, TIE: TIE, PLAYER: PLAYER, BANKER: BANKER}
+
+
+# Encode 'Player'/'Banker'/'Tie' strings, their P/B/T initials or int codes
+# (a plain list of ints, say) as int8 codes
+def encode_results(results):
+    try:
+        return np.fromiter((_ENCODING[r] for r in results), dtype=np.int8, count=len(results))
+    except KeyError as e:
+        raise ValueError(f"unexpected result {e.args[0]!r}") from None
+
+
+# Accept int code arrays as they are and encode anything else
+def as_codes(results):
+    if isinstance(results, np.ndarray) and results.dtype.kind in 'iu':
+        return results.astype(np.int8, copy=False)
+    return encode_results(results)
+
+
+def decode_results(codes):
+    return RESULT_NAMES[np.asarray(codes)]
+
+
+# `count` synthetic shoes of `rounds` results each, as a 2-D int8 array drawn
+# at the real P/B/T frequencies; the same seed always gives the same shoes
+def random_shoes(count, rounds, seed=None):
+    rng = np.random.default_rng(seed)
+    return rng.choice(3, size=(count, rounds), p=RESULT_PROBABILITIES).astype(np.int8)
+
+
+# Batch version of the first update_result pass: 'Cumulative Wins/Losses',
+# new_column and proportion_1..4 for a whole shoe in one call. Works on the
+# last axis, so a 2-D array of equal-length shoes is processed at once.
+def transition_columns(codes):
+    codes = np.asarray(codes, dtype=np.int8)
+    n = codes.shape[-1]
+    non_tie = codes != TIE
+
+    step = np.where(codes == PLAYER, 1, np.where(codes == BANKER, -1, 0))
+    cumulative = np.cumsum(step, axis=-1)
+
+    # Previous non-tie result for every round (TIE where there is none yet)
+    positions = np.where(non_tie, np.arange(n), -1)
+    last_non_tie = np.maximum.accumulate(positions, axis=-1)
+    previous = np.full(codes.shape, -1)
+    previous[..., 1:] = last_non_tie[..., :-1]
+    previous_code = np.where(previous >= 0, np.take_along_axis(codes, np.maximum(previous, 0), axis=-1), TIE)
+    new_column = np.where(non_tie, _TRANSITIONS[previous_code, codes], 0).astype(np.int8)
+
+    # Counts and non-tie totals only move on non-tie rounds, so dividing the
+    # running sums also carries the last proportions over ties
+    non_tie_rounds = np.cumsum(non_tie, axis=-1)
+    denominator = non_tie_rounds - 1
+    valid = denominator > 0
+
+    # The first non-tie round is never assigned a proportion: it keeps 0 when
+    # it is the very first round and NaN when the shoe opened with ties (an
+    # empty shoe has no first round)
+    first_unassigned = non_tie & (non_tie_rounds == 1)
+    if n:
+        first_unassigned[..., 0] = False
+
+    columns = {'Cumulative Wins/Losses': cumulative, 'new_column': new_column}
+    for k in range(1, 5):
+        counts = np.cumsum(new_column == k, axis=-1)
+        proportion = np.divide(counts, denominator, out=np.zeros(codes.shape), where=valid)
+        proportion[first_unassigned] = np.nan
+        columns[f'proportion_{k}'] = proportion
+    return columns
+
+
+# Streaming transition_columns: carries the running counts so each result
+# code is handled in O(1). push() returns the round's Cumulative Wins/Losses,
+# new_column and [proportion_1..4].
+class Transitions:
+    __slots__ = ('count', 'cumulative', 'non_tie_rounds', 'counts', 'last_non_tie',
+                 'prev_proportions', 'proportions')
+
+    # new_column by [previous non-tie code][code], as lists for fast indexing
+    TABLE = _TRANSITIONS.tolist()
+
+    def __init__(self):
+        self.count = 0
+        self.cumulative = 0
+        self.non_tie_rounds = 0
+        self.counts = [0, 0, 0, 0]
+        self.last_non_tie = TIE  # none yet
+        self.prev_proportions = [0, 0, 0, 0]
+        self.proportions = [0, 0, 0, 0]
+
+    # Rebuild the streaming state after a batch run of transition_columns
+    @classmethod
+    def from_columns(cls, codes, columns):
+        state = cls()
+        codes = np.asarray(codes)
+        state.count = len(codes)
+        if state.count == 0:
+            return state
+        non_tie = np.flatnonzero(codes != TIE)
+        state.cumulative = int(columns['Cumulative Wins/Losses'][-1])
+        state.non_tie_rounds = len(non_tie)
+        state.counts = [int((columns['new_column'] == k).sum()) for k in range(1, 5)]
+        if len(non_tie):
+            state.last_non_tie = int(codes[non_tie[-1]])
+        state.proportions = [float(columns[f'proportion_{k}'][-1]) for k in range(1, 5)]
+        if state.non_tie_rounds > 1:
+            state.prev_proportions = state.proportions
+        return state
+
+    def push(self, code):
+        i = self.count
+        self.count += 1
+        if code == PLAYER:
+            self.cumulative += 1
+        elif code == BANKER:
+            self.cumulative -= 1
+
+        new_column = 0
+        if code != TIE:
+            self.non_tie_rounds += 1
+            new_column = self.TABLE[self.last_non_tie][code]
+            if new_column:
+                self.counts[new_column - 1] += 1
+            self.last_non_tie = code
+
+            if self.non_tie_rounds > 1:
+                proportions = [c / (self.non_tie_rounds - 1) for c in self.counts]
+                self.prev_proportions = proportions
+            else:
+                # The first non-tie round is never assigned a proportion. It kept
+                # the column's initial 0 when it was the very first round, and
+                # NaN when the shoe opened with ties.
+                proportions = [0 if i == 0 else math.nan] * 4
+        else:
+            proportions = self.prev_proportions
+        self.proportions = proportions
+        return self.cumulative, new_column, proportions
+
+    def copy(self):
+        clone = copy.copy(self)
+        clone.counts = list(self.counts)
+        return clone
+
+
+# Support/resistance for a whole series of 'Cumulative Wins/Losses' values.
+# Same verification rules as the old per-row loop: tracking starts at index 2,
+# a new low resets low_verified, and a later value above that low verifies it
+# (mirrored for highs). Scans run along the last axis, so a 2-D array of many
+# shoes is processed in one call.
+def support_resistance(values):
+    values = np.asarray(values, dtype=np.float64)
+    support = np.full(values.shape, np.nan)
+    resistance = np.full(values.shape, np.nan)
+    if values.shape[-1] > 2:
+        tracked = values[..., 2:]
+        support[..., 2:] = _verified_low(tracked)[0]
+        resistance[..., 2:] = -_verified_low(-tracked)[0]
+    return support, resistance
+
+
+# Last verified running low of `values` along the last axis, plus whether the
+# current low is verified at each step
+def _verified_low(values):
+    index = np.arange(values.shape[-1])
+    low = np.minimum.accumulate(values, axis=-1)
+
+    # A new low starts a segment; within it the low is verified once any value
+    # moves back above it
+    is_new = np.ones(values.shape, dtype=bool)
+    is_new[..., 1:] = values[..., 1:] < low[..., :-1]
+    segment_start = np.maximum.accumulate(np.where(is_new, index, 0), axis=-1)
+    last_above = np.maximum.accumulate(np.where(values > low, index, -1), axis=-1)
+    verified = last_above >= segment_start
+
+    # Between verifications the previous verified low is carried forward
+    last_verified = np.maximum.accumulate(np.where(verified, index, -1), axis=-1)
+    out = np.take_along_axis(low, np.maximum(last_verified, 0), axis=-1)
+    return np.where(last_verified >= 0, out, np.nan), verified
+
+
+# Streaming support/resistance: carries the tracker state so each new
+# 'Cumulative Wins/Losses' value is handled in O(1)
+class SupportResistance:
+    __slots__ = ('count', 'last_low', 'last_high', 'low_verified', 'high_verified',
+                 'support', 'resistance')
+
+    def __init__(self):
+        self.count = 0
+        self.last_low = np.inf
+        self.last_high = -np.inf
+        self.low_verified = False
+        self.high_verified = False
+        self.support = np.nan
+        self.resistance = np.nan
+
+    # Rebuild the streaming state after a batch run over `values`
+    @classmethod
+    def from_values(cls, values):
+        state = cls()
+        values = np.asarray(values, dtype=np.float64)
+        state.count = len(values)
+        if state.count > 2:
+            tracked = values[2:]
+            support, low_verified = _verified_low(tracked)
+            resistance, high_verified = _verified_low(-tracked)
+            state.last_low = tracked.min()
+            state.last_high = tracked.max()
+            state.low_verified = bool(low_verified[-1])
+            state.high_verified = bool(high_verified[-1])
+            state.support = support[-1]
+            state.resistance = -resistance[-1]
+        return state
+
+    def push(self, value):
+        i = self.count
+        self.count += 1
+        # Verification needs two prior rounds, so indices 0 and 1 stay NaN
+        if i < 2:
+            return np.nan, np.nan
+
+        if value < self.last_low:
+            self.last_low = value
+            self.low_verified = False  # Reset verification on new low
+        elif not self.low_verified and value > self.last_low:
+            self.low_verified = True
+        if self.low_verified:
+            self.support = self.last_low
+
+        if value > self.last_high:
+            self.last_high = value
+            self.high_verified = False  # Reset verification on new high
+        elif not self.high_verified and value < self.last_high:
+            self.high_verified = True
+        if self.high_verified:
+            self.resistance = self.last_high
+
+        return self.support, self.resistance
+
+    def copy(self):
+        return copy.copy(self)
+
+
+# RSI over the last axis, so a 2-D array of many series is handled in one call.
+# Matches the old pandas version (diff, clip, rolling(window).mean()) bit for
+# bit, including the NaN warm-up of `window` rounds. Pass decimals=1 for the
+# values the app shows.
+def rsi(values, window=14, decimals=None):
+    values = np.asarray(values, dtype=np.float64)
+    delta = np.full(values.shape, np.nan)
+    delta[..., 1:] = np.diff(values, axis=-1)
+    # Same signs as clip(lower=0) and -1 * clip(upper=0)
+    up = np.where(delta > 0, delta, 0.0)
+    down = np.where(delta < 0, -delta, -0.0)
+    up[np.isnan(delta)] = np.nan
+    down[np.isnan(delta)] = np.nan
+
+    roll_up = _rolling_mean(up, window)
+    roll_down = _rolling_mean(down, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = roll_up / roll_down
+        out = 100 - (100 / (1 + rs))
+    if decimals is not None:
+        out = np.round(out, decimals)
+    return out
+
+
+# rolling(window).mean() along the last axis. All series run through pandas'
+# kernel (see RollingMean) as one flat Series, with windows that never reach
+# back past the start of their own series; the kernel starts its sums afresh
+# at each such start, so every series gets exactly its own rolling().mean().
+def _rolling_mean(values, window):
+    n = values.shape[-1]
+    if values.size == 0:
+        return np.full(values.shape, np.nan)
+    windows = _SeriesWindows(window_size=window, length=n)
+    means = pd.Series(values.ravel()).rolling(windows, min_periods=window).mean()
+    return means.to_numpy().reshape(values.shape)
+
+
+class _SeriesWindows(BaseIndexer):
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        end = np.arange(1, num_values + 1, dtype=np.int64)
+        series_start = end - 1 - (end - 1) % self.length
+        return np.maximum(end - self.window_size, series_start), end
+
+
+# Streaming rolling mean with the same arithmetic as pandas' rolling().mean():
+# compensated add/remove sums, the sign clamps and the repeated-value rule, so
+# values agree bit for bit. The window itself lives in a ring buffer.
+class RollingMean:
+    __slots__ = ('window', 'buffer', 'count', 'nobs', 'total', 'neg_ct',
+                 'compensation_add', 'compensation_remove', 'same_count', 'prev_value')
+
+    def __init__(self, window):
+        self.window = window
+        self.buffer = [math.nan] * window
+        self.count = 0
+        self.nobs = 0
+        self.total = 0.0
+        self.neg_ct = 0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.same_count = 0
+        self.prev_value = math.nan
+
+    def push(self, value):
+        slot = self.count % self.window
+        if self.count >= self.window:
+            self._remove(self.buffer[slot])
+        self.buffer[slot] = value
+        self.count += 1
+        self._add(value)
+
+        if self.nobs < self.window:
+            return math.nan
+        result = self.total / self.nobs
+        if self.same_count >= self.nobs:
+            result = self.prev_value
+        elif self.neg_ct == 0 and result < 0:
+            result = 0.0
+        elif self.neg_ct == self.nobs and result > 0:
+            result = 0.0
+        return result
+
+    def _add(self, value):
+        if math.isnan(value):
+            return
+        self.nobs += 1
+        y = value - self.compensation_add
+        t = self.total + y
+        self.compensation_add = t - self.total - y
+        self.total = t
+        if math.copysign(1.0, value) < 0:
+            self.neg_ct += 1
+        if value == self.prev_value:
+            self.same_count += 1
+        else:
+            self.same_count = 1
+        self.prev_value = value
+
+    def copy(self):
+        clone = copy.copy(self)
+        clone.buffer = list(self.buffer)
+        return clone
+
+    def _remove(self, value):
+        if math.isnan(value):
+            return
+        self.nobs -= 1
+        y = -value - self.compensation_remove
+        t = self.total + y
+        self.compensation_remove = t - self.total - y
+        self.total = t
+        if math.copysign(1.0, value) < 0:
+            self.neg_ct -= 1
+
+
+# Streaming RSI: one new value in, the next RSI value out in O(1)
+class RollingRSI:
+    __slots__ = ('decimals', 'prev', 'roll_up', 'roll_down')
+
+    def __init__(self, window=14, decimals=None):
+        self.decimals = decimals
+        self.prev = math.nan
+        self.roll_up = RollingMean(window)
+        self.roll_down = RollingMean(window)
+
+    def push(self, value):
+        delta = value - self.prev
+        self.prev = value
+        if math.isnan(delta):
+            up = down = math.nan
+        else:
+            # Same signs as clip(lower=0) and -1 * clip(upper=0)
+            up = delta if delta > 0 else 0.0
+            down = -delta if delta < 0 else -0.0
+        roll_up = self.roll_up.push(up)
+        roll_down = self.roll_down.push(down)
+
+        if math.isnan(roll_up) or math.isnan(roll_down):
+            return math.nan
+        if roll_down == 0:
+            if roll_up == 0:
+                return math.nan
+            out = 100.0
+        else:
+            out = 100 - (100 / (1 + roll_up / roll_down))
+        if self.decimals is not None:
+            out = round(out * 10 ** self.decimals) / 10 ** self.decimals
+        return out
+
+    def copy(self):
+        clone = copy.copy(self)
+        clone.roll_up = self.roll_up.copy()
+        clone.roll_down = self.roll_down.copy()
+        return clone
+
+
+# Slope over `offset` rounds along the last axis, NaN until enough history
+def slope(values, offset=2):
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(values.shape, np.nan)
+    out[..., offset:] = (values[..., offset:] - values[..., :-offset]) / offset
+    return out
+
+
+# Every indicator column the strategy reads, computed in one batch pass over
+# encoded results (1-D shoe or 2-D stack of equal-length shoes)
+def indicator_columns(codes, rsi_window=10):
+    columns = transition_columns(codes)
+    columns['rsi_p3'] = rsi(columns['proportion_3'], window=rsi_window, decimals=1)
+    columns['rsi_p4'] = rsi(columns['proportion_4'], window=rsi_window, decimals=1)
+    columns['support'], columns['resistance'] = support_resistance(columns['Cumulative Wins/Losses'])
+    columns['slope_p3'] = slope(columns['proportion_3'], offset=2)
+    columns['slope_p4'] = slope(columns['proportion_4'], offset=2)
+    columns['slope_p3_5'] = slope(columns['proportion_3'], offset=5)
+    columns['slope_p4_5'] = slope(columns['proportion_4'], offset=5)
+    return columns
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from indicators import BANKER, PLAYER, TIE
+
+
+# Result code for every byte value a road letter can take; -1 for the rest
+_ROAD_CODES = np.full(256, -1, dtype=np.int8)
+for _letter, _code in (('T', TIE), ('P', PLAYER), ('B', BANKER)):
+    _ROAD_CODES[ord(_letter)] = _ROAD_CODES[ord(_letter.lower())] = _code
+
+# Result code for each (upper-cased) CSV value
+_CSV_CODES = {'T': TIE, 'TIE': TIE, 'P': PLAYER, 'PLAYER': PLAYER, 'B': BANKER, 'BANKER': BANKER}
+
+# Whitespace and separators allowed between letters of a pasted road
+_SEPARATORS = ' \t\r\n,;-|/'
+
+
+# int8 result codes for a road string such as "BPPTBB" (case-insensitive;
+# spaces, commas and similar separators are ignored). `offset` is the number of
+# results before `text` when it is one chunk of a longer road.
+def parse_road(text, offset=0):
+    raw = np.frombuffer(text.encode('latin-1', errors='replace'), dtype=np.uint8)
+    raw = raw[~np.isin(raw, np.frombuffer(_SEPARATORS.encode(), dtype=np.uint8))]
+    codes = _ROAD_CODES[raw]
+    bad = np.flatnonzero(codes < 0)
+    if len(bad):
+        raise ValueError(f"unexpected {chr(raw[bad[0]])!r} at result {offset + bad[0] + 1}; use B, P and T")
+    return codes
+
+
+# int8 result codes from a CSV file (path or file object) with one round per
+# row. The result column may hold names or P/B/T letters in any case.
+def read_results_csv(file, result_column='result'):
+    df = pd.read_csv(file, usecols=[result_column], dtype=str, keep_default_na=False)
+    codes = df[result_column].str.strip().str.upper().map(_CSV_CODES)
+    bad = np.flatnonzero(codes.isna())
+    if len(bad):
+        raise ValueError(f"unexpected result {df[result_column].iloc[bad[0]]!r} in row {bad[0] + 1}")
+    return codes.to_numpy(dtype=np.int8)
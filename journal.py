@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+
+from indicators import as_codes
+
+
+# Letters used on disk for each result; R marks a game reset
+_LETTERS = {'Player': 'P', 'Banker': 'B', 'Tie': 'T'}
+# The same letters indexed by result code
+_CODE_LETTERS = 'TPB'
+
+
+# Append-only journal of update_result events on the local filesystem.
+#
+# Events go to numbered segment files, one line each ("G1 12 P"). Writes are
+# flushed and fsync'ed in batches: after `sync_every` events, or at most
+# `sync_interval` seconds after the first unsynced one. Every `snapshot_every`
+# events the current road of every game is written to a snapshot and a new
+# segment is started, so recovery reads one snapshot plus a bounded tail.
+class Journal:
+    def __init__(self, directory, sync_every=32, sync_interval=0.5, snapshot_every=5000):
+        self.directory = directory
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.snapshot_every = snapshot_every
+        self.lock = threading.Lock()
+        self.timer = None
+        self.pending = 0
+        self.since_snapshot = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.roads, self.segment = self._recover()
+        # Never append after a possibly torn tail; start a fresh segment
+        self.segment += 1
+        self.file = open(self._segment_path(self.segment), 'a', encoding='ascii')
+
+    def _segment_path(self, seq):
+        return os.path.join(self.directory, f'segment-{seq:08d}.log')
+
+    def _snapshot_path(self, seq):
+        return os.path.join(self.directory, f'snapshot-{seq:08d}.json')
+
+    def _files(self, prefix):
+        seqs = []
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix + '-') and name.count('.') == 1:
+                stem = name[len(prefix) + 1:name.index('.')]
+                if stem.isdigit():
+                    seqs.append(int(stem))
+        return sorted(seqs)
+
+    # Roads per game from the newest readable snapshot plus the segments after it
+    def _recover(self):
+        roads, start = {}, 0
+        for seq in reversed(self._files('snapshot')):
+            try:
+                with open(self._snapshot_path(seq), encoding='ascii') as f:
+                    roads = {game: list(road) for game, road in json.load(f)['games'].items()}
+                start = seq
+                break
+            except (OSError, ValueError, KeyError):
+                continue
+
+        segments = [seq for seq in self._files('segment') if seq > start]
+        for seq in segments:
+            with open(self._segment_path(seq), encoding='ascii', errors='replace') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break  # torn final write
+                    self._apply(roads, line.split())
+        return roads, max(segments + [start])
+
+    def _apply(self, roads, fields):
+        if len(fields) != 3 or not fields[1].isdigit():
+            return
+        game, round_num, letter = fields[0], int(fields[1]), fields[2]
+        if letter == 'R':
+            roads[game] = []
+        elif letter in 'PBT' and len(letter) == 1:
+            road = roads.setdefault(game, [])
+            # Only the next round counts; repeats from another session are dropped
+            if round_num == len(road) + 1:
+                road.append(letter)
+
+    # Road of `game` as a string of P/B/T letters
+    def road(self, game):
+        with self.lock:
+            return ''.join(self.roads.get(game, ()))
+
+    def append(self, game, round_num, result):
+        self._write(game, round_num, _LETTERS[result])
+
+    def reset(self, game):
+        self._write(game, 0, 'R')
+
+    # Write a whole shoe at once (names, letters or codes): it replaces the
+    # road of `game`, or with replace=False continues it. All events are
+    # synced together.
+    def load(self, game, results, replace=True):
+        letters = [_CODE_LETTERS[code] for code in as_codes(results)]
+        with self.lock:
+            start = 0 if replace else len(self.roads.get(game, ()))
+            events = [[game, '0', 'R']] if replace else []
+            events += [[game, str(start + k + 1), letter] for k, letter in enumerate(letters)]
+            self._write_events(events)
+            self._sync()
+
+    def _write(self, game, round_num, letter):
+        with self.lock:
+            self._write_events([[game, str(round_num), letter]])
+
+    def _write_events(self, events):
+        for fields in events:
+            self._apply(self.roads, fields)
+        self.file.write(''.join(' '.join(fields) + '\n' for fields in events))
+        self.pending += len(events)
+        self.since_snapshot += len(events)
+        if self.pending >= self.sync_every:
+            self._sync()
+        elif self.timer is None:
+            self.timer = threading.Timer(self.sync_interval, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+        if self.since_snapshot >= self.snapshot_every:
+            self._snapshot()
+
+    def flush(self):
+        with self.lock:
+            self._sync()
+
+    def _sync(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.pending and not self.file.closed:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.pending = 0
+
+    # Write the current roads as snapshot N and continue in segment N + 1;
+    # older snapshots and segments are then no longer needed
+    def _snapshot(self):
+        self._sync()
+        self.file.close()
+        seq = self.segment
+        tmp = self._snapshot_path(seq) + '.tmp'
+        with open(tmp, 'w', encoding='ascii') as f:
+            json.dump({'games': {game: ''.join(road) for game, road in self.roads.items()}}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._snapshot_path(seq))
+        self._fsync_directory()
+
+        for old in self._files('segment'):
+            if old <= seq:
+                os.remove(self._segment_path(old))
+        for old in self._files('snapshot'):
+            if old < seq:
+                os.remove(self._snapshot_path(old))
+
+        self.segment = seq + 1
+        self.file = open(self._segment_path(self.segment), 'a', encoding='ascii')
+        self.since_snapshot = 0
+
+    def _fsync_directory(self):
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def close(self):
+        with self.lock:
+            self._sync()
+            self.file.close()
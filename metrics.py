@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+
+
+# Running totals for one stage of one game
+class StageStats:
+    __slots__ = ('calls', 'seconds', 'last', 'rows')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.last = 0.0
+        self.rows = 0
+
+
+class _Timer:
+    __slots__ = ('metrics', 'game', 'stage', 'rows', 'start')
+
+    def __init__(self, metrics, game, stage, rows):
+        self.metrics = metrics
+        self.game = game
+        self.stage = stage
+        self.rows = rows
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.game, self.stage, time.perf_counter() - self.start, self.rows)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+# Opt-in per-stage timers and counters (calls, cumulative time, last duration,
+# rows processed) keyed by game and stage. While disabled, timer() hands out a
+# shared no-op context manager and record() returns at once, so instrumented
+# code costs one attribute check.
+class Metrics:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def timer(self, game, stage, rows=1):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, game, stage, rows)
+
+    def record(self, game, stage, seconds, rows=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            stats = self.stages.get((game, stage))
+            if stats is None:
+                stats = self.stages[(game, stage)] = StageStats()
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.last = seconds
+            stats.rows += rows
+
+    def reset(self, game=None):
+        with self.lock:
+            if game is None:
+                self.stages.clear()
+            else:
+                for key in [key for key in self.stages if key[0] == game]:
+                    del self.stages[key]
+
+    # One dict per stage, for all games or just `game`
+    def snapshot(self, game=None):
+        with self.lock:
+            return [{'game': g, 'stage': stage, 'calls': stats.calls, 'seconds': stats.seconds,
+                     'last_seconds': stats.last, 'rows': stats.rows}
+                    for (g, stage), stats in self.stages.items() if game is None or g == game]
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    # Prometheus text exposition format
+    def to_prometheus(self):
+        rows = self.snapshot()
+        lines = []
+        for name, key, kind, help_text in (
+            ('game_stage_calls_total', 'calls', 'counter', 'Calls of each stage'),
+            ('game_stage_seconds_total', 'seconds', 'counter', 'Cumulative time spent in each stage'),
+            ('game_stage_last_seconds', 'last_seconds', 'gauge', 'Duration of the last call of each stage'),
+            ('game_stage_rows_total', 'rows', 'counter', 'Rows processed by each stage'),
+        ):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for row in rows:
+                labels = f'game="{_escape(row["game"])}",stage="{_escape(row["stage"])}"'
+                lines.append(f'{name}{{{labels}}} {row[key]}')
+        return '\n'.join(lines) + '\n'
+
+    # Write the current values to `path`: Prometheus text for .prom/.txt,
+    # JSON otherwise. The file is replaced atomically so scrapers never see
+    # half of it.
+    def export(self, path):
+        text = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json()
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+        return path
+
+    # Serve GET /metrics (Prometheus) and GET /metrics.json on a background
+    # thread; returns the server so callers can shut it down
+    def serve(self, port, host='127.0.0.1'):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, content_type = metrics.to_prometheus(), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body, content_type = metrics.to_json(), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                body = body.encode()
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Registry shared by the engine and the app; enabled with GAME_METRICS=1
+metrics = Metrics(enabled=os.environ.get('GAME_METRICS') == '1')
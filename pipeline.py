@@ -0,0 +1,207 @@
+import argparse
+import itertools
+import json
+import math
+import sys
+from collections import deque
+
+from indicators import RESULT_CODES, RollingRSI, SupportResistance, Transitions
+from strategy import DEFAULT_PARAMS, Lookback, Strategy
+
+
+# The indicator chain as a stream. A round is a dict record; every stage is a
+# generator that takes an iterable of records, adds its columns to each one and
+# passes it on, keeping only its own running state. A chain over live results,
+# a replayed journal or a multi-GB file therefore runs in constant memory, and
+# its records match the rows of GameEngine.push() (float64, before the
+# store's float32). Stages yield exactly one record per record they take, in
+# order, so a tap between two of them sees every round.
+
+# Result name for every form a result can take
+_NAMES = {}
+for _name, _code in RESULT_CODES.items():
+    _NAMES[_name] = _NAMES[_name[0]] = _NAMES[_code] = _name
+
+# Stage order of indicator_chain(); taps are keyed by these names
+STAGES = ('rounds', 'transitions', 'rsi', 'support_resistance', 'slopes', 'decisions')
+
+
+# Source: one record per result ('Player'/'Banker'/'Tie', P/B/T or int codes)
+def rounds(results):
+    for round_num, result in enumerate(results, 1):
+        try:
+            yield {'round_num': round_num, 'result': _NAMES[result]}
+        except KeyError:
+            raise ValueError(f"unexpected result {result!r} in round {round_num}") from None
+
+
+# Cumulative Wins/Losses, new_column and proportion_1..4
+def transitions(records):
+    state = Transitions()
+    for record in records:
+        cumulative, new_column, proportions = state.push(RESULT_CODES[record['result']])
+        record['new_column'] = new_column
+        record['proportion_1'], record['proportion_2'], record['proportion_3'], record['proportion_4'] = proportions
+        record['Cumulative Wins/Losses'] = cumulative
+        yield record
+
+
+# rsi_p3/rsi_p4, rounded to 1 decimal like the app shows them
+def rsi(records, window=DEFAULT_PARAMS.rsi_window):
+    rsi_p3 = RollingRSI(window, decimals=1)
+    rsi_p4 = RollingRSI(window, decimals=1)
+    for record in records:
+        record['rsi_p3'] = rsi_p3.push(record['proportion_3'])
+        record['rsi_p4'] = rsi_p4.push(record['proportion_4'])
+        yield record
+
+
+def support_resistance(records):
+    state = SupportResistance()
+    for record in records:
+        record['support'], record['resistance'] = state.push(record['Cumulative Wins/Losses'])
+        yield record
+
+
+# Slopes of proportion_3/4 over 2 and 5 rounds, from the last five values
+def slopes(records):
+    p3, p4 = deque(maxlen=5), deque(maxlen=5)
+    for record in records:
+        v3, v4 = record['proportion_3'], record['proportion_4']
+        full = len(p3) == 5
+        record['slope_p3'] = (v3 - p3[-2]) / 2 if len(p3) >= 2 else math.nan
+        record['slope_p4'] = (v4 - p4[-2]) / 2 if len(p4) >= 2 else math.nan
+        record['slope_p3_5'] = (v3 - p3[0]) / 5 if full else math.nan
+        record['slope_p4_5'] = (v4 - p4[0]) / 5 if full else math.nan
+        p3.append(v3)
+        p4.append(v4)
+        yield record
+
+
+# Bounce/slope strategy: next_rd_decision, 下注 and the bankroll as profit.
+# The strategy reads back a few rounds of each indicator, kept in lookback
+# windows.
+def decisions(records, params=DEFAULT_PARAMS):
+    strategy = Strategy(params)
+    recent = Lookback.columns(params)
+    for i, record in enumerate(records):
+        for name, values in recent.items():
+            values.append(record[name])
+        record['next_rd_decision'] = strategy.step(i, record['result'], recent)
+        record['下注'] = float(strategy.bet_size)
+        record['profit'] = float(strategy.B)
+        yield record
+
+
+# Call `callback(record)` on every record passing this point. Later stages
+# add to the same dict, so a callback that keeps records should copy them.
+def tap(records, callback):
+    for record in records:
+        callback(record)
+        yield record
+
+
+# The full chain over one shoe of results. `taps` maps stage names (see
+# STAGES) to callbacks run on each record right after that stage.
+def indicator_chain(results, params=DEFAULT_PARAMS, taps=None):
+    stages = (
+        ('transitions', transitions),
+        ('rsi', lambda records: rsi(records, params.rsi_window)),
+        ('support_resistance', support_resistance),
+        ('slopes', slopes),
+        ('decisions', lambda records: decisions(records, params)),
+    )
+    taps = taps or {}
+    unknown = set(taps) - set(STAGES)
+    if unknown:
+        raise ValueError(f"unknown stage {sorted(unknown)[0]!r}; choose from {', '.join(STAGES)}")
+
+    records = rounds(results)
+    if 'rounds' in taps:
+        records = tap(records, taps['rounds'])
+    for name, stage in stages:
+        records = stage(records)
+        if name in taps:
+            records = tap(records, taps[name])
+    return records
+
+
+# Push side of a chain, for live results: send() runs one result through
+# every stage and returns its record
+class Feed:
+    __slots__ = ('pending', 'records')
+
+    def __init__(self, params=DEFAULT_PARAMS, taps=None):
+        self.pending = deque()
+        self.records = indicator_chain(self._results(), params, taps)
+
+    def _results(self):
+        while True:
+            yield self.pending.popleft()
+
+    def send(self, result):
+        self.pending.append(result)
+        return next(self.records)
+
+
+# Result codes of a road text file (see ingest.parse_road), read in chunks
+def read_road(path, chunk_size=1 << 20):
+    from ingest import parse_road
+
+    offset = 0
+    with open(path, encoding='latin-1') as f:
+        for text in iter(lambda: f.read(chunk_size), ''):
+            codes = parse_road(text, offset)
+            offset += len(codes)
+            yield codes
+
+
+# Records of many shoes, each run through its own chain and tagged with its
+# shoe id; `shoes` yields (shoe_id, results) like backtest.iter_shoes()
+def replay(shoes, params=DEFAULT_PARAMS, taps=None):
+    for shoe_id, results in shoes:
+        for record in indicator_chain(results, params, taps):
+            record['shoe'] = shoe_id
+            yield record
+
+
+def _json_value(value):
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a road or shoe file through the indicator chain "
+                                                 "and write one JSON record per round.")
+    parser.add_argument('path', help="road text file (.txt) with one shoe, or CSV/Parquet with many")
+    parser.add_argument('--shoe-column', default='shoe')
+    parser.add_argument('--result-column', default='result')
+    parser.add_argument('--columns', help="comma separated columns to write (default: all)")
+    args = parser.parse_args(argv)
+
+    if args.path.endswith('.txt'):
+        shoes = [(0, itertools.chain.from_iterable(read_road(args.path)))]
+    else:
+        from backtest import iter_shoes
+
+        shoes = iter_shoes(args.path, args.shoe_column, args.result_column)
+    columns = args.columns.split(',') if args.columns else None
+
+    out = sys.stdout
+    try:
+        for record in replay(shoes):
+            if columns:
+                record = {name: record[name] for name in columns}
+            out.write(json.dumps({name: _json_value(value) for name, value in record.items()},
+                                 ensure_ascii=False) + '\n')
+    except BrokenPipeError:
+        pass
+    except ValueError as e:
+        sys.exit(f"{args.path}: {e}")
+
+
+if __name__ == '__main__':
+    main()
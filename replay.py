@@ -0,0 +1,325 @@
+import argparse
+import inspect
+import json
+import os
+import sys
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import reference
+from engine import GameEngine
+from indicators import RESULT_PROBABILITIES, TIE, as_codes, decode_results, indicator_columns
+from pipeline import indicator_chain
+from store import DECISION_NAMES
+from strategy import DEFAULT_PARAMS, simulate_batch
+
+
+# Deterministic replay and differential testing of the bounce/slope state
+# machine. A trace is one dict per round with the decision, the amount staked
+# and the state machine's internals after that round (TRACE_FIELDS). The
+# reference trace is read out of reference.update_result while it runs, by a
+# line tracer on its strategy loop, so the reference itself stays verbatim.
+# Every fast path gives the fields it can observe; traces are compared round
+# by round, and a failing shoe is shrunk to a minimal result sequence that
+# still fails. Everything is seeded, so a run can be repeated exactly.
+
+TRACE_FIELDS = ('decision', 'bet', 'bankroll', 'next_bet_size', 'bounce_active', 'slope_active',
+                'consecutive_wins', 'consecutive_losses', 'wins_total')
+
+# Line of the reference's strategy loop that ends a round; a line event fires
+# before the line runs, when every other local of the round is final
+_SOURCE, _FIRST_LINE = inspect.getsourcelines(reference.update_result)
+_END_OF_ROUND = _FIRST_LINE + next(k for k, line in enumerate(_SOURCE)
+                                   if line.strip() == 'previous_decision = next_bet')
+
+
+def _names(results):
+    return decode_results(as_codes(results)).tolist()
+
+
+# Reference trace of the final click after clicking every earlier result. Each
+# click replays the whole shoe, so the last one walks every round. By default
+# the earlier clicks are replaced by one click plus one concat of the other
+# rows, which leaves the frame the final click reads exactly as the clicks
+# would (see _prime); clicks=True makes every click, in O(n^2).
+def reference_trace(results, clicks=False):
+    names = _names(results)
+    if not names:
+        return []
+    state = reference.new_state()
+    trace = []
+    code = reference.update_result.__code__
+
+    def trace_round(frame, event, arg):
+        if event == 'line' and frame.f_lineno == _END_OF_ROUND:
+            trace.append(_reference_round(frame.f_locals))
+        return trace_round
+
+    def trace_calls(frame, event, arg):
+        return trace_round if frame.f_code is code else None
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        if clicks:
+            for winner in names[:-1]:
+                reference.update_result(state, winner)
+        else:
+            _prime(state, names[:-1])
+        previous = sys.gettrace()
+        sys.settrace(trace_calls)
+        try:
+            reference.update_result(state, names[-1])
+        finally:
+            sys.settrace(previous)
+    return trace
+
+
+# The state clicking `names` one by one leaves behind, from one click and one
+# concat. Every click recomputes all the columns the strategy reads; the only
+# cells no click ever writes (new_column on ties and the proportions of the
+# first non-tie round) stay as the columns were created: 0 on the first row
+# and NaN on rows added later by concat, as here.
+def _prime(state, names):
+    if not names:
+        return
+    reference.update_result(state, names[0])
+    if len(names) > 1:
+        rows = pd.DataFrame({'round_num': range(2, len(names) + 1), 'result': names[1:]})
+        state['df_game'] = pd.concat([state['df_game'], rows], ignore_index=True)
+        for winner in names[1:]:
+            state['cumulative_wins'][winner] += 1
+        state['round_num'] = len(names) + 1
+
+
+def _reference_round(local):
+    next_bet = local['next_bet']
+    return {
+        'decision': next_bet,
+        'bet': 0 if next_bet == 'No Bet' else local['next_bet_size'],
+        'bankroll': local['B'],
+        'next_bet_size': local['next_bet_size'],
+        'bounce_active': local['bounce_active'],
+        'slope_active': local['slope_active'],
+        'consecutive_wins': local['consecutive_wins'],
+        'consecutive_losses': local['consecutive_losses'],
+        'wins_total': local['wins_total'],
+    }
+
+
+# GameEngine.push(), which exposes the whole Strategy after every round
+def engine_trace(results):
+    engine = GameEngine()
+    trace = []
+    for winner in _names(results):
+        row = engine.push(winner)
+        strategy = engine.strategy
+        trace.append({
+            'decision': row['next_rd_decision'],
+            'bet': strategy.bet_size,
+            'bankroll': strategy.B,
+            'next_bet_size': strategy.next_bet_size,
+            'bounce_active': strategy.bounce_active,
+            'slope_active': strategy.slope_active,
+            'consecutive_wins': strategy.consecutive_wins,
+            'consecutive_losses': strategy.consecutive_losses,
+            'wins_total': strategy.wins_total,
+        })
+    return trace
+
+
+def _outcome_trace(decisions, bets, bankroll):
+    return [{'decision': decision, 'bet': bet, 'bankroll': value}
+            for decision, bet, value in zip(decisions, bets, bankroll)]
+
+
+# GameEngine.from_results(): batch indicators and simulate(), read back from
+# the store
+def bulk_trace(results):
+    store = GameEngine.from_results(as_codes(results)).store
+    return _outcome_trace(DECISION_NAMES[store.column('next_rd_decision')].tolist(),
+                          store.column('下注').tolist(), store.column('profit').tolist())
+
+
+# simulate_batch(), the shoe-vectorized state machine
+def batch_trace(results):
+    codes = as_codes(results)[None]
+    if codes.size == 0:
+        return []
+    decisions, bets, bankroll = simulate_batch(codes, indicator_columns(codes, DEFAULT_PARAMS.rsi_window))
+    return _outcome_trace(DECISION_NAMES[decisions[0]].tolist(), bets[0].tolist(), bankroll[0].tolist())
+
+
+# The streaming pipeline's records
+def pipeline_trace(results):
+    records = indicator_chain(as_codes(results).tolist())
+    return [{'decision': r['next_rd_decision'], 'bet': r['下注'], 'bankroll': r['profit']} for r in records]
+
+
+TARGETS = {'engine': engine_trace, 'bulk': bulk_trace, 'batch': batch_trace, 'pipeline': pipeline_trace}
+
+
+def _same(a, b):
+    if isinstance(a, float) and isinstance(b, float) and a != a and b != b:
+        return True
+    return a == b
+
+
+# First disagreement of `actual` with the `expected` trace, comparing the
+# fields `actual` has, or None
+def first_difference(expected, actual):
+    for i, (want, got) in enumerate(zip(expected, actual)):
+        for field in TRACE_FIELDS:
+            if field in got and not _same(want[field], got[field]):
+                return {'round': i + 1, 'field': field, 'expected': want[field], 'actual': got[field]}
+    if len(expected) != len(actual):
+        return {'round': min(len(expected), len(actual)) + 1, 'field': 'length',
+                'expected': len(expected), 'actual': len(actual)}
+    return None
+
+
+# `count` shoes of rounds/4 to `rounds` results. Each shoe draws its own P/B/T
+# frequencies around the real ones, so streaky, tie-heavy and balanced shoes
+# all reach the rarer branches, and about one in five opens with ties, which
+# the reference treats differently. The same seed gives the same corpus.
+def random_corpus(count, rounds=80, seed=None):
+    rng = np.random.default_rng(seed)
+    shoes = []
+    for _ in range(count):
+        length = int(rng.integers(max(1, rounds // 4), rounds + 1))
+        probabilities = rng.dirichlet(np.array(RESULT_PROBABILITIES) * 20)
+        codes = rng.choice(3, size=length, p=probabilities).astype(np.int8)
+        if rng.random() < 0.2:
+            codes[:int(rng.integers(1, 4))] = TIE
+        shoes.append(codes)
+    return shoes
+
+
+# Differences of each target from the reference on one shoe
+def check_shoe(codes, targets=tuple(TARGETS), clicks=False):
+    expected = reference_trace(codes, clicks)
+    differences = {}
+    for name in targets:
+        difference = first_difference(expected, TARGETS[name](codes))
+        if difference is not None:
+            differences[name] = difference
+    return differences
+
+
+def _check_shoe(args):
+    return check_shoe(*args)
+
+
+# A shortest result sequence found that still fails: rounds after the first
+# difference cannot matter (every column only looks back), so the shoe is cut
+# there first, then chunks of halving size are dropped while it still fails
+def shrink(codes, fails, round_num=None):
+    codes = np.asarray(codes, dtype=np.int8)
+    if round_num is not None and round_num < len(codes) and fails(codes[:round_num]):
+        codes = codes[:round_num]
+    chunk = len(codes) // 2
+    while chunk >= 1:
+        start = 0
+        while start < len(codes):
+            candidate = np.concatenate([codes[:start], codes[start + chunk:]])
+            if len(candidate) and fails(candidate):
+                codes = candidate
+            else:
+                start += chunk
+        chunk //= 2
+    return codes
+
+
+# Minimal failing shoe for one target and its difference from the reference
+def shrink_failure(codes, target, difference=None, clicks=False):
+    def fails(candidate):
+        return first_difference(reference_trace(candidate, clicks), TARGETS[target](candidate)) is not None
+
+    codes = shrink(codes, fails, difference['round'] if difference else None)
+    return codes, first_difference(reference_trace(codes, clicks), TARGETS[target](codes))
+
+
+# Check `shoes` against the reference with up to `processes` workers; returns
+# (shoe index, differences) for the failing shoes in order
+def differential_run(shoes, targets=tuple(TARGETS), clicks=False, processes=None):
+    jobs = [(codes, tuple(targets), clicks) for codes in shoes]
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(jobs) < 2:
+        results = map(_check_shoe, jobs)
+    else:
+        with ProcessPoolExecutor(min(processes, len(jobs))) as pool:
+            results = list(pool.map(_check_shoe, jobs, chunksize=8))
+    return [(k, differences) for k, differences in enumerate(results) if differences]
+
+
+def _road(codes):
+    return ''.join('TPB'[code] for code in codes)
+
+
+def _read_road(road):
+    from ingest import parse_road
+
+    if os.path.exists(road):
+        with open(road, encoding='latin-1') as f:
+            road = f.read()
+    return parse_road(road)
+
+
+def _json_value(value):
+    if isinstance(value, float) and value != value:
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay shoes through the reference and the fast paths "
+                                                 "and diff the state machine round by round.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    trace = commands.add_parser('trace', help="write the per-round trace of one shoe as JSON lines")
+    trace.add_argument('road', help="road such as BPPTBB, or a text file holding one")
+    trace.add_argument('--target', default='reference', choices=['reference'] + list(TARGETS))
+    trace.add_argument('--clicks', action='store_true', help="replay every click of the reference")
+
+    diff = commands.add_parser('diff', help="diff the fast paths against the reference on random shoes")
+    diff.add_argument('--shoes', type=int, default=200)
+    diff.add_argument('--rounds', type=int, default=80, help="longest shoe")
+    diff.add_argument('--seed', type=int, default=0)
+    diff.add_argument('--targets', default=','.join(TARGETS), help="comma separated (default: %(default)s)")
+    diff.add_argument('--clicks', action='store_true', help="replay every click of the reference (slow)")
+    diff.add_argument('--processes', type=int, help="worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'trace':
+        try:
+            codes = _read_road(args.road)
+        except ValueError as e:
+            parser.error(str(e))
+        rounds = reference_trace(codes, args.clicks) if args.target == 'reference' else TARGETS[args.target](codes)
+        for round_num, row in enumerate(rounds, 1):
+            print(json.dumps({'round': round_num, **{name: _json_value(value) for name, value in row.items()}}))
+        return
+
+    targets = [name for name in args.targets.split(',') if name]
+    unknown = [name for name in targets if name not in TARGETS]
+    if unknown:
+        parser.error(f"unknown target {unknown[0]!r}; choose from {', '.join(TARGETS)}")
+    shoes = random_corpus(args.shoes, args.rounds, args.seed)
+    failures = differential_run(shoes, targets, args.clicks, args.processes)
+    print(f"{len(shoes)} shoes, {sum(len(shoe) for shoe in shoes)} rounds, seed {args.seed}")
+    for name in targets:
+        failing = [(k, differences[name]) for k, differences in failures if name in differences]
+        print(f"{name:>10}  {len(failing)} failing shoes")
+        if failing:
+            k, difference = failing[0]
+            codes, difference = shrink_failure(shoes[k], name, difference, args.clicks)
+            print(f"{'':>10}  shoe {k} shrinks to {_road(codes)} ({len(codes)} rounds): round {difference['round']} "
+                  f"{difference['field']} expected {difference['expected']!r}, got {difference['actual']!r}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
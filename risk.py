@@ -0,0 +1,132 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from indicators import RESULT_PROBABILITIES, indicator_columns
+from strategy import DEFAULT_PARAMS, Strategy, StrategyParams, check_params, simulate_batch
+
+
+# Monte Carlo risk of the bankroll and bet-sizing rules: synthetic shoes drawn
+# from given P/B/T probabilities are played through the real state machine
+# (simulate_batch, vectorized across the shoes of a batch) and batches are
+# spread over worker processes. Per shoe only the final bankroll, the lowest
+# bankroll and the first round that left the B_low..B_high band are kept.
+
+
+# Per-shoe outcomes for one batch of `count` shoes from its own seed
+def run_batch(count, rounds, probabilities, params, seed):
+    rng = np.random.default_rng(seed)
+    codes = rng.choice(3, size=(count, rounds), p=probabilities).astype(np.int8)
+    columns = indicator_columns(codes, rsi_window=params.rsi_window)
+    _, _, bankroll = simulate_batch(codes, columns, params)
+
+    strategy = Strategy(params)
+    outside = (bankroll >= strategy.B_high) | (bankroll <= strategy.B_low)
+    stopped = outside.any(axis=1)
+    # First round (1-based) the bankroll reached a stop band, 0 if it never did
+    stop_round = np.where(stopped, outside.argmax(axis=1) + 1, 0)
+    stop_side = np.where(stopped, np.sign(bankroll[np.arange(count), stop_round - 1] - strategy.B), 0)
+    return {
+        'final': bankroll[:, -1],
+        'lowest': bankroll.min(axis=1),
+        'stop_round': stop_round.astype(np.int32),
+        'stop_side': stop_side.astype(np.int8),
+    }
+
+
+def _run_batch(args):
+    return run_batch(*args)
+
+
+# Simulate `shoes` shoes of `rounds` rounds in batches of `batch_size`,
+# `processes` at a time. Every batch gets its own child of `seed`, so for a
+# given seed and batch size the results do not depend on the process count.
+def simulate_risk(shoes, rounds=80, probabilities=RESULT_PROBABILITIES, params=DEFAULT_PARAMS,
+                  batch_size=4000, processes=None, seed=None):
+    if shoes < 1:
+        raise ValueError("need at least one shoe")
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    probabilities = probabilities / probabilities.sum()
+    counts = [min(batch_size, shoes - start) for start in range(0, shoes, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(counts))
+    jobs = [(count, rounds, probabilities, params, child) for count, child in zip(counts, seeds)]
+
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(jobs) == 1:
+        batches = [_run_batch(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(min(processes, len(jobs))) as pool:
+            batches = list(pool.map(_run_batch, jobs))
+    return {name: np.concatenate([batch[name] for batch in batches]) for name in batches[0]}
+
+
+# Distribution of the final bankroll, probability of ruin (the bankroll ever
+# at or below `ruin_level`) and time to the first stop band
+def summarize(outcomes, params=DEFAULT_PARAMS, ruin_level=None):
+    strategy = Strategy(params)
+    ruin_level = strategy.B_low if ruin_level is None else ruin_level
+    final = outcomes['final']
+    stop_round = outcomes['stop_round']
+    stopped = stop_round > 0
+    percentiles = [1, 5, 25, 50, 75, 95, 99]
+    summary = {
+        'shoes': len(final),
+        'mean_final_bankroll': final.mean(),
+        'std_final_bankroll': final.std(),
+        **{f'p{q}_final_bankroll': value for q, value in zip(percentiles, np.percentile(final, percentiles))},
+        'mean_pnl': final.mean() - strategy.B,
+        'ruin_level': ruin_level,
+        'ruin_probability': (outcomes['lowest'] <= ruin_level).mean(),
+        'stop_probability': stopped.mean(),
+        'stop_high_probability': (outcomes['stop_side'] > 0).mean(),
+        'stop_low_probability': (outcomes['stop_side'] < 0).mean(),
+    }
+    if stopped.any():
+        times = stop_round[stopped]
+        summary.update({
+            'mean_rounds_to_stop': times.mean(),
+            **{f'p{q}_rounds_to_stop': value for q, value in zip((5, 50, 95), np.percentile(times, (5, 50, 95)))},
+        })
+    return summary
+
+
+def _parse_params(specs):
+    values = {}
+    for spec in specs:
+        name, _, value = spec.partition('=')
+        if name not in StrategyParams._fields:
+            raise ValueError(f"unknown parameter {name!r}; choose from {', '.join(StrategyParams._fields)}")
+        values[name] = type(getattr(DEFAULT_PARAMS, name))(value)
+    return check_params(DEFAULT_PARAMS._replace(**values))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo risk of the strategy's bankroll rules on synthetic shoes.")
+    parser.add_argument('--shoes', type=int, default=1_000_000)
+    parser.add_argument('--rounds', type=int, default=80, help="rounds per shoe")
+    tie, player, banker = RESULT_PROBABILITIES
+    parser.add_argument('--banker', type=float, default=banker, help="probability of a Banker win")
+    parser.add_argument('--player', type=float, default=player, help="probability of a Player win")
+    parser.add_argument('--tie', type=float, default=tie, help="probability of a tie")
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=VALUE',
+                        help="override a strategy parameter (repeatable)")
+    parser.add_argument('--ruin', type=float, help="bankroll level that counts as ruin (default: the B_low stop band)")
+    parser.add_argument('--batch-size', type=int, default=4000, help="shoes per vectorized batch")
+    parser.add_argument('--processes', type=int, help="worker processes (default: all cores)")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    try:
+        params = _parse_params(args.param)
+    except ValueError as e:
+        parser.error(str(e))
+    outcomes = simulate_risk(args.shoes, args.rounds, (args.tie, args.player, args.banker), params,
+                             args.batch_size, args.processes, args.seed)
+    for name, value in summarize(outcomes, params, args.ruin).items():
+        print(f'{name:>24}  {value:,.4f}' if isinstance(value, float) else f'{name:>24}  {value:,}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import threading
+import time
+
+import pandas as pd
+
+from ingest import parse_road
+from journal import Journal
+from strategy import DEFAULT_PARAMS
+from tables import GameTables, check_game
+
+
+# Local game-state service. One GameEngine per table lives in this process;
+# every result is computed once here and the new state is pushed to every
+# session subscribed to that table, however many operators are watching.
+#
+# The protocol is one JSON object per line over a Unix socket or a localhost
+# TCP port. Requests carry an "op" and get exactly one reply ({"ok": true,
+# ...} or {"ok": false, "error": ...}):
+#
+#   {"op": "state", "game": "G1"}
+#   {"op": "result", "game": "G1", "round_num": 12, "result": "Player"}
+#   {"op": "reset", "game": "G1"}
+#   {"op": "load", "game": "G1", "road": "BPPTBB...", "replace": true}
+#   {"op": "history", "game": "G1", "page": 0, "page_size": 50}
+#   {"op": "whatif", "game": "G1", "depth": 2}
+#   {"op": "subscribe", "games": ["G1", "G2"]}
+#
+# After subscribing, the connection also receives {"op": "update", "game": ...,
+# "state": {...}} whenever a subscribed table changes.
+
+
+# 'unix:/path/to.sock' or 'host:port' as ('unix', path) or ('tcp', (host, port))
+def parse_address(address):
+    if address.startswith('unix:'):
+        return 'unix', address[len('unix:'):]
+    host, _, port = address.rpartition(':')
+    return 'tcp', (host or '127.0.0.1', int(port))
+
+
+# The tables of the process behind the socket protocol above
+class GameServer(GameTables):
+    def __init__(self, journal=None, params=DEFAULT_PARAMS):
+        super().__init__(journal, params)
+        self.subscribers = {}
+
+    def handle(self, request, writer):
+        op = request.get('op')
+        game = request.get('game')
+        if op == 'state':
+            return {'state': self.state(game)}
+        if op == 'result':
+            if request.get('result') not in ('Player', 'Banker', 'Tie'):
+                raise ValueError(f"unknown result {request.get('result')!r}")
+            accepted = self.apply(game, int(request['round_num']), request['result'])
+            if accepted:
+                self._publish(game)
+            return {'accepted': accepted, 'state': self.state(game)}
+        if op == 'reset':
+            self.reset(game)
+            self._publish(game)
+            return {'state': self.state(game)}
+        if op == 'load':
+            self.load(game, parse_road(request['road']), bool(request.get('replace', True)))
+            self._publish(game)
+            return {'state': self.state(game)}
+        if op == 'history':
+            df = self.history(game, int(request.get('page', 0)), int(request.get('page_size', 50)))
+            return {'history': {name: df[name].tolist() for name in df.columns}}
+        if op == 'whatif':
+            return {'branches': self.what_if(game, int(request.get('depth', 1)))}
+        if op == 'subscribe':
+            for name in request['games']:
+                check_game(name)
+            for name in request['games']:
+                self.subscribers.setdefault(name, set()).add(writer)
+            return {'states': [self.state(name) for name in request['games']]}
+        raise ValueError(f'unknown op {op!r}')
+
+    # Push the new state of `game` to its subscribers; the state is computed
+    # once, whatever the number of subscribers
+    def _publish(self, game):
+        writers = self.subscribers.get(game)
+        if not writers:
+            return
+        line = _encode({'op': 'update', 'game': game, 'state': self.state(game)})
+        for writer in list(writers):
+            if writer.is_closing():
+                writers.discard(writer)
+            else:
+                writer.write(line)
+
+    async def _client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    reply = {'ok': True, **self.handle(json.loads(line), writer)}
+                except (ValueError, KeyError, TypeError) as e:
+                    reply = {'ok': False, 'error': str(e)}
+                writer.write(_encode(reply))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for writers in self.subscribers.values():
+                writers.discard(writer)
+            writer.close()
+
+    async def serve(self, address):
+        kind, where = parse_address(address)
+        if kind == 'unix':
+            if os.path.exists(where):
+                os.remove(where)
+            server = await asyncio.start_unix_server(self._client, where)
+        else:
+            server = await asyncio.start_server(self._client, *where)
+        async with server:
+            await server.serve_forever()
+
+
+def _encode(message):
+    return (json.dumps(message) + '\n').encode()
+
+
+# Close a connection that may already be broken; unsent bytes are dropped
+def _close(file):
+    try:
+        file.close()
+    except OSError:
+        pass
+
+
+# Blocking client for the app. Requests go over one connection; subscribe()
+# opens a second one whose pushed states are kept in `latest` by a background
+# thread, so a rerun can show the newest state without a round trip. Both
+# connections are reopened when the server restarts: a request that finds its
+# connection closed is sent once more on a new one, and the listener
+# subscribes again (refreshing `latest`) as soon as the server is back.
+class GameClient:
+    def __init__(self, address, timeout=5.0, retry_interval=1.0):
+        self.address = address
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.lock = threading.Lock()
+        self.latest = {}
+        self.file = self._connect(timeout)
+
+    def _connect(self, timeout):
+        kind, where = parse_address(self.address)
+        if kind == 'unix':
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            sock.connect(where)
+        else:
+            sock = socket.create_connection(where, timeout)
+        return sock.makefile('rwb')
+
+    def request(self, op, **fields):
+        message = _encode({'op': op, **fields})
+        with self.lock:
+            try:
+                reply = self._exchange(message)
+            except OSError:
+                _close(self.file)
+                self.file = self._connect(self.timeout)
+                reply = self._exchange(message)
+        if not reply.pop('ok'):
+            raise RuntimeError(reply['error'])
+        if 'state' in reply:
+            self.latest[reply['state']['game']] = reply['state']
+        return reply
+
+    def _exchange(self, message):
+        self.file.write(message)
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("game server closed the connection")
+        return json.loads(line)
+
+    def state(self, game):
+        return self.request('state', game=game)['state']
+
+    # Returns (accepted, state); not accepted means round_num was already entered
+    def result(self, game, round_num, result):
+        reply = self.request('result', game=game, round_num=round_num, result=result)
+        return reply['accepted'], reply['state']
+
+    def reset(self, game):
+        return self.request('reset', game=game)['state']
+
+    # Import a whole shoe of result codes; see GameServer.load()
+    def load(self, game, codes, replace=True):
+        road = ''.join('TPB'[code] for code in codes)
+        return self.request('load', game=game, road=road, replace=replace)['state']
+
+    def history(self, game, page=0, page_size=50):
+        return pd.DataFrame(self.request('history', game=game, page=page, page_size=page_size)['history'])
+
+    # Branches of the next `depth` rounds; see whatif.what_if()
+    def what_if(self, game, depth=1):
+        return self.request('whatif', game=game, depth=depth)['branches']
+
+    def subscribe(self, games, callback=None):
+        games = list(games)
+        file = self._subscribe(games)
+
+        def listen(file):
+            while True:
+                try:
+                    for line in file:
+                        message = json.loads(line)
+                        if message.get('op') == 'update':
+                            self.latest[message['game']] = message['state']
+                            if callback is not None:
+                                callback(message['state'])
+                except OSError:
+                    pass
+                _close(file)
+                file = None
+                while file is None:
+                    time.sleep(self.retry_interval)
+                    try:
+                        file = self._subscribe(games)
+                    except (OSError, ValueError):
+                        pass
+
+        threading.Thread(target=listen, args=(file,), daemon=True).start()
+
+    def _subscribe(self, games):
+        # No timeout: the connection sits idle until a table changes
+        file = self._connect(None)
+        try:
+            file.write(_encode({'op': 'subscribe', 'games': games}))
+            file.flush()
+            states = json.loads(file.readline())['states']
+        except (OSError, ValueError):
+            _close(file)
+            raise
+        for state in states:
+            self.latest[state['game']] = state
+        return file
+
+    def close(self):
+        self.file.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve game state for every table to the app's sessions.")
+    parser.add_argument('--address', default=os.environ.get('GAME_SERVER', '127.0.0.1:8765'),
+                        help="unix:/path/to.sock or host:port (default: %(default)s)")
+    parser.add_argument('--journal-dir', default=os.environ.get('JOURNAL_DIR', 'journal'),
+                        help="journal directory; tables are restored from it on start")
+    args = parser.parse_args(argv)
+
+    journal = Journal(args.journal_dir)
+    # Stop as on Ctrl-C so the journal is synced before exiting
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        asyncio.run(GameServer(journal).serve(args.address))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        journal.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+from indicators import RESULT_CODES, RESULT_NAMES
+from strategy import FRAME_COLUMNS
+
+
+# int8 codes for next_rd_decision
+DECISION_NAMES = np.array(['No Bet', 'Player', 'Banker'], dtype=object)
+DECISION_CODES = {name: code for code, name in enumerate(DECISION_NAMES)}
+
+# Storage dtype of every stored column. round_num is implicit (row + 1) and
+# the bankroll columns stay float64 so cents are never rounded away.
+COLUMN_DTYPES = {
+    'result': np.int8,
+    'next_rd_decision': np.int8,
+    'new_column': np.int8,
+    'Cumulative Wins/Losses': np.int32,
+    'proportion_1': np.float32,
+    'proportion_2': np.float32,
+    'proportion_3': np.float32,
+    'proportion_4': np.float32,
+    'rsi_p3': np.float32,
+    'rsi_p4': np.float32,
+    'support': np.float32,
+    'resistance': np.float32,
+    'slope_p3': np.float32,
+    'slope_p4': np.float32,
+    'slope_p3_5': np.float32,
+    'slope_p4_5': np.float32,
+    'profit': np.float64,
+    '下注': np.float64,
+}
+
+# Columns holding RSI values, which are defined to one decimal
+_RSI_COLUMNS = ('rsi_p3', 'rsi_p4')
+
+
+# Compact history of one game: one preallocated NumPy array per column that
+# doubles its capacity when full. Results and decisions are stored as int8
+# codes; DataFrames are only built, for a slice of rows, when displaying.
+class GameStore:
+    __slots__ = ('game', 'length', 'capacity', 'arrays')
+
+    def __init__(self, game=None, capacity=128):
+        self.game = game
+        self.length = 0
+        self.capacity = capacity
+        self.arrays = {name: np.empty(capacity, dtype=dtype) for name, dtype in COLUMN_DTYPES.items()}
+
+    def __len__(self):
+        return self.length
+
+    # Append one round. `row` maps column names to values; result and
+    # next_rd_decision may be given as names or codes.
+    def append(self, row):
+        if self.length == self.capacity:
+            self._grow(self.capacity * 2)
+        i = self.length
+        for name, array in self.arrays.items():
+            value = row[name]
+            if name == 'result' and isinstance(value, str):
+                value = RESULT_CODES[value]
+            elif name == 'next_rd_decision' and isinstance(value, str):
+                value = DECISION_CODES[value]
+            array[i] = value
+        self.length += 1
+
+    # Append many rounds at once from equal-length column arrays
+    def extend(self, columns):
+        n = len(columns['result'])
+        if self.length + n > self.capacity:
+            capacity = self.capacity
+            while capacity < self.length + n:
+                capacity *= 2
+            self._grow(capacity)
+        for name, array in self.arrays.items():
+            values = columns[name]
+            if name == 'result' and not np.issubdtype(np.asarray(values).dtype, np.integer):
+                values = [RESULT_CODES[value] for value in values]
+            elif name == 'next_rd_decision' and not np.issubdtype(np.asarray(values).dtype, np.integer):
+                values = [DECISION_CODES[value] for value in values]
+            array[self.length:self.length + n] = values
+        self.length += n
+
+    def _grow(self, capacity):
+        for name, array in self.arrays.items():
+            grown = np.empty(capacity, dtype=array.dtype)
+            grown[:self.length] = array[:self.length]
+            self.arrays[name] = grown
+        self.capacity = capacity
+
+    # View of the filled part of a column in its storage dtype
+    def column(self, name):
+        return self.arrays[name][:self.length]
+
+    # DataFrame of rows [start, stop) laid out like the game frame (or with
+    # just `columns`), with names decoded and indicators widened to float64
+    def to_frame(self, start=0, stop=None, columns=FRAME_COLUMNS):
+        stop = self.length if stop is None else min(stop, self.length)
+        start = min(max(start, 0), stop)
+        data = {'round_num': np.arange(start + 1, stop + 1)}
+        for name in columns:
+            if name == 'round_num':
+                continue
+            values = self.arrays[name][start:stop]
+            if name == 'result':
+                values = RESULT_NAMES[values]
+            elif name == 'next_rd_decision':
+                values = DECISION_NAMES[values]
+            elif name in _RSI_COLUMNS:
+                values = np.round(values.astype(np.float64), 1)
+            elif values.dtype == np.float32:
+                values = values.astype(np.float64)
+            data[name] = values
+        return pd.DataFrame(data, columns=columns, index=pd.RangeIndex(start, stop))
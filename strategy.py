@@ -0,0 +1,375 @@
+from collections import deque, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from indicators import BANKER, PLAYER, TIE, as_codes, decode_results, indicator_columns
+
+
+# Tunable strategy parameters; the defaults are the values update_result has
+# always used. Only rsi_window changes the indicator columns, the rest only
+# affect the state machine. (update_result also declared slope_offset and
+# rsi_max, but never read them.)
+StrategyParams = namedtuple('StrategyParams', [
+    'win_threshold', 'loss_threshold', 'multiplier', 'slope_2_offset',
+    'rsi_window', 'warmup_rounds', 'bet_fraction', 'initial_bankroll',
+], defaults=[0.35, 0.4, 2.2, 4, 10, 20, 1/20, 5000])
+
+DEFAULT_PARAMS = StrategyParams()
+
+
+# Raise ValueError for parameters the state machine cannot run with. The
+# triggers read rsi three rounds back and Cumulative Wins/Losses
+# slope_2_offset rounds back from the first warm round; earlier than that the
+# indices go negative and would wrap around to the end of the shoe.
+def check_params(params):
+    if params.slope_2_offset < 0:
+        raise ValueError(f"slope_2_offset must not be negative, got {params.slope_2_offset}")
+    if params.warmup_rounds < max(3, params.slope_2_offset):
+        raise ValueError(f"warmup_rounds must be at least max(3, slope_2_offset) = "
+                         f"{max(3, params.slope_2_offset)}, got {params.warmup_rounds}")
+    if params.rsi_window < 1:
+        raise ValueError(f"rsi_window must be at least 1, got {params.rsi_window}")
+    return params
+
+# Column order of the game DataFrame built by the original full replay
+FRAME_COLUMNS = [
+    'round_num', 'result', 'next_rd_decision', 'profit', 'new_column',
+    'proportion_1', 'proportion_2', 'proportion_3', 'proportion_4',
+    'Cumulative Wins/Losses', 'rsi_p3', 'rsi_p4', 'support', 'resistance',
+    'slope_p3', 'slope_p4', 'slope_p3_5', 'slope_p4_5', '下注',
+]
+
+# Columns Strategy.step() and the slopes read back, with how far back they look
+LOOKBACK_COLUMNS = (
+    'proportion_3', 'proportion_4', 'Cumulative Wins/Losses', 'rsi_p3', 'rsi_p4',
+    'support', 'resistance', 'slope_p3', 'slope_p4', 'slope_p3_5', 'slope_p4_5',
+)
+
+
+# The last few values of a column, indexed by absolute round number, so a
+# streaming caller can hand step() windows instead of whole columns
+class Lookback:
+    __slots__ = ('values', 'count')
+
+    def __init__(self, size):
+        self.values = deque(maxlen=size)
+        self.count = 0
+
+    # One window per LOOKBACK_COLUMNS entry, deep enough for `params`
+    @classmethod
+    def columns(cls, params=DEFAULT_PARAMS):
+        size = max(6, params.slope_2_offset + 1)
+        return {name: cls(size) for name in LOOKBACK_COLUMNS}
+
+    def append(self, value):
+        self.values.append(value)
+        self.count += 1
+
+    def __getitem__(self, i):
+        return self.values[i - self.count + len(self.values)]
+
+    def copy(self):
+        clone = Lookback(self.values.maxlen)
+        clone.values.extend(self.values)
+        clone.count = self.count
+        return clone
+
+
+# Bounce/slope state machine and bankroll. step() is called once per round
+# with the indicator columns so far (lists or arrays indexed by round) and
+# returns the decision for the next round.
+class Strategy:
+    def __init__(self, params=DEFAULT_PARAMS):
+        self.params = check_params(params)
+        self.multiplier = params.multiplier
+        self.slope_2_offset = params.slope_2_offset
+        self.warmup_rounds = params.warmup_rounds
+
+        self.B = params.initial_bankroll
+        self.T_B = params.initial_bankroll * 0.2
+        self.base_bet_size = (params.bet_fraction * self.T_B)  # Initial fixed bet size for each round
+        self.next_bet_size = self.base_bet_size
+        self.B_high = self.B + (params.win_threshold * self.T_B)
+        self.B_low = self.B - (params.loss_threshold * self.T_B)
+        self.consecutive_wins = 0
+        self.consecutive_losses = 0
+        self.wins_total = 0
+        self.bounce_active = False
+        self.slope_active = False
+        self.previous_decision = None
+
+    # Amount staked on the decision returned by the last step()
+    @property
+    def bet_size(self):
+        return 0 if self.previous_decision == 'No Bet' else self.next_bet_size
+
+    def step(self, i, result, cols):
+        rsi_p3 = cols['rsi_p3'][i]
+        rsi_p4 = cols['rsi_p4'][i]
+        current_support = cols['support'][i]
+        current_resistance = cols['resistance'][i]
+        cumulative_wins_losses = cols['Cumulative Wins/Losses'][i]
+        slope_p3, slope_p4 = cols['slope_p3'][i], cols['slope_p4'][i]
+        slope_p3_5, slope_p4_5 = cols['slope_p3_5'][i], cols['slope_p4_5'][i]
+        previous_decision = self.previous_decision
+        base_bet_size = self.base_bet_size
+
+        next_bet = 'No Bet'
+
+        # Player bounce strategy. The Banker bounce branch in update_result was an
+        # `elif` on the same guard, so it could never fire and is not replayed here.
+        if not self.bounce_active and i >= self.warmup_rounds:
+            if (0 <= cumulative_wins_losses - current_support <= 2):
+                p3, p4 = cols['rsi_p3'], cols['rsi_p4']
+                if (p4[i-1] <= p3[i-1] or p4[i-2] <= p3[i-2] or p4[i-3] <= p3[i-3]) and slope_p4_5 > 0 and slope_p3_5 < 0:
+                    next_bet = 'Player'
+                    self.bounce_active = True
+
+        # Continue bounce betting
+        if self.bounce_active:
+            if previous_decision == 'Player':
+                next_bet = 'Player'
+            elif previous_decision == 'Banker':
+                next_bet = 'Banker'
+
+        # Slope-based strategy, only if the bounce strategy did not trigger
+        if next_bet == 'No Bet':
+            # Cross Resistance: p4 upward slope, p3 downward slope
+            if not self.slope_active and i >= self.warmup_rounds and slope_p4 > 0 and slope_p3 < 0 and slope_p4_5 > 0 and slope_p3_5 < 0:
+                if rsi_p4 - 1 > rsi_p3:
+                    cumulative_wins_losses_ago = cols['Cumulative Wins/Losses'][i - self.slope_2_offset]
+                    if cumulative_wins_losses - current_resistance >= 3 and cumulative_wins_losses - cumulative_wins_losses_ago >= 3:
+                        next_bet = 'Player'
+                        self.slope_active = True
+
+            # Cross Support: p3 upward slope, p4 downward slope
+            elif not self.slope_active and i >= self.warmup_rounds and slope_p3 > 0 and slope_p4 < 0 and slope_p3_5 > 0 and slope_p4_5 < 0:
+                if rsi_p3 - 1 > rsi_p4:
+                    cumulative_wins_losses_ago = cols['Cumulative Wins/Losses'][i - self.slope_2_offset]
+                    if cumulative_wins_losses <= current_support - 3 and cumulative_wins_losses - cumulative_wins_losses_ago <= -3:
+                        next_bet = 'Banker'
+                        self.slope_active = True
+
+            if self.slope_active:
+                if previous_decision == 'Player':
+                    next_bet = 'Player'
+                elif previous_decision == 'Banker':
+                    next_bet = 'Banker'
+
+        # Settle the previous round's bet
+        if previous_decision in ('Player', 'Banker') and result != 'Tie':
+            if result == previous_decision:
+                self.consecutive_losses = 0
+                self.wins_total += 1
+                # Grow the bet with each consecutive win, capping at 3 consecutive wins
+                if self.consecutive_wins == 0:
+                    bet_size = base_bet_size
+                else:
+                    bet_size = base_bet_size * (self.multiplier ** min(self.consecutive_wins, 3))
+                self.consecutive_wins += 1
+                if result == 'Banker':
+                    self.B += 0.95 * self.next_bet_size  # Banker win returns 0.95 due to commission
+                else:
+                    self.B += self.next_bet_size
+                self.next_bet_size = bet_size * self.multiplier
+            else:
+                self.B -= self.next_bet_size
+                self.consecutive_losses += 1
+                self.consecutive_wins = 0
+                self.wins_total -= 1
+                self.next_bet_size = base_bet_size
+
+        B = self.B
+        wins_total, consecutive_losses = self.wins_total, self.consecutive_losses
+
+        # Stopping conditions for the bounce strategy. They only end the run and
+        # reset the bet size; the decision already taken for this round stands.
+        if self.bounce_active and ((rsi_p4 <= rsi_p3 and next_bet == 'Player') or cumulative_wins_losses >= current_resistance or wins_total >= 3 or consecutive_losses >= 2 or B >= self.B_high or B <= self.B_low):
+            self.bounce_active = False
+            self.next_bet_size = base_bet_size
+
+        if self.bounce_active and ((rsi_p3 <= rsi_p4 and next_bet == 'Banker') or cumulative_wins_losses <= current_support or wins_total >= 3 or consecutive_losses >= 2 or B >= self.B_high or B <= self.B_low):
+            self.bounce_active = False
+            self.next_bet_size = base_bet_size
+
+        # Stopping conditions for the slope strategy
+        if self.slope_active:
+            if next_bet == 'Player' and rsi_p3 >= rsi_p4:
+                self.slope_active = False
+                self.next_bet_size = base_bet_size
+            elif next_bet == 'Banker' and rsi_p3 <= rsi_p4:
+                self.slope_active = False
+                self.next_bet_size = base_bet_size
+            elif wins_total >= 3 or consecutive_losses >= 2 or B >= self.B_high or B <= self.B_low:
+                self.slope_active = False
+                self.next_bet_size = base_bet_size
+
+        self.previous_decision = next_bet
+        return next_bet
+
+
+# Run the strategy over a whole result sequence ('Player'/'Banker'/'Tie',
+# P/B/T initials or int8 codes) and return the columns of the game frame.
+# Indicators are computed in one vectorized pass; only the state machine
+# walks the rounds.
+def strategy_columns(results, params=DEFAULT_PARAMS):
+    codes = as_codes(results)
+    return _play(codes, indicator_columns(codes, rsi_window=params.rsi_window), params)
+
+
+# strategy_columns for many shoes. Shoes of equal length share one 2-D
+# indicator pass, which is most of the per-shoe cost for short shoes.
+def strategy_columns_many(shoes, params=DEFAULT_PARAMS):
+    codes = [as_codes(shoe) for shoe in shoes]
+    out = [None] * len(codes)
+    for k, columns in shoe_indicators(codes, params.rsi_window):
+        out[k] = _play(codes[k], columns, params)
+    return out
+
+
+# Indicator columns for each shoe as (position, columns), grouping shoes of
+# equal length into one 2-D pass
+def shoe_indicators(codes, rsi_window):
+    by_length = {}
+    for k, shoe in enumerate(codes):
+        by_length.setdefault(len(shoe), []).append(k)
+
+    for positions in by_length.values():
+        stacked = indicator_columns(np.stack([codes[k] for k in positions]), rsi_window=rsi_window)
+        for row, k in enumerate(positions):
+            yield k, {name: values[row] for name, values in stacked.items()}
+
+
+# Walk the state machine over one shoe. `names` are result names and `cols`
+# the indicator columns as plain lists, which index much faster than NumPy
+# scalars inside the loop. Returns decisions, bet sizes and bankroll per round;
+# pass `strategy` to keep the final state.
+def simulate(names, cols, params=DEFAULT_PARAMS, strategy=None):
+    strategy = strategy or Strategy(params)
+    decisions, bet_sizes, bankroll = [], [], []
+    for i, result in enumerate(names):
+        decisions.append(strategy.step(i, result, cols))
+        bet_sizes.append(strategy.bet_size)
+        bankroll.append(strategy.B)
+    return decisions, bet_sizes, bankroll
+
+
+# The state machine of Strategy.step() over many shoes at once: `codes` is a
+# 2-D array of equal-length shoes and `columns` their 2-D indicator columns.
+# It still walks the rounds, but every round is a handful of array operations
+# across all shoes. Decisions come back as codes (0=No Bet, 1=Player,
+# 2=Banker, the same numbers as the results they bet on), with the bet size
+# and bankroll after every round; all three match simulate() exactly.
+def simulate_batch(codes, columns, params=DEFAULT_PARAMS):
+    codes = np.asarray(codes)
+    shoes, rounds = codes.shape
+    strategy = Strategy(params)
+    base, multiplier = strategy.base_bet_size, strategy.multiplier
+    B_high, B_low = strategy.B_high, strategy.B_low
+    # Next bet after a win, by consecutive wins before it (capped at 3)
+    growth = np.array([base] + [base * (multiplier ** k) for k in (1, 2, 3)])
+
+    p3, p4 = columns['rsi_p3'], columns['rsi_p4']
+    cumulative = columns['Cumulative Wins/Losses']
+
+    B = np.full(shoes, float(strategy.B))
+    next_bet_size = np.full(shoes, base)
+    consecutive_wins = np.zeros(shoes, dtype=np.int64)
+    consecutive_losses = np.zeros(shoes, dtype=np.int64)
+    wins_total = np.zeros(shoes, dtype=np.int64)
+    bounce_active = np.zeros(shoes, dtype=bool)
+    slope_active = np.zeros(shoes, dtype=bool)
+    previous = np.zeros(shoes, dtype=np.int8)
+
+    decisions = np.zeros((shoes, rounds), dtype=np.int8)
+    bet_sizes = np.zeros((shoes, rounds))
+    bankroll = np.zeros((shoes, rounds))
+
+    for i in range(rounds):
+        result = codes[:, i]
+        rsi_p3, rsi_p4 = p3[:, i], p4[:, i]
+        support, resistance = columns['support'][:, i], columns['resistance'][:, i]
+        cwl = cumulative[:, i]
+        slope_p3, slope_p4 = columns['slope_p3'][:, i], columns['slope_p4'][:, i]
+        slope_p3_5, slope_p4_5 = columns['slope_p3_5'][:, i], columns['slope_p4_5'][:, i]
+        continuing = (previous == PLAYER) | (previous == BANKER)
+
+        next_bet = np.zeros(shoes, dtype=np.int8)
+        warm = i >= strategy.warmup_rounds
+
+        # Player bounce strategy
+        if warm:
+            above_support = cwl - support
+            crossed = (p4[:, i - 1] <= p3[:, i - 1]) | (p4[:, i - 2] <= p3[:, i - 2]) | (p4[:, i - 3] <= p3[:, i - 3])
+            trigger = (~bounce_active & (0 <= above_support) & (above_support <= 2) & crossed
+                       & (slope_p4_5 > 0) & (slope_p3_5 < 0))
+            next_bet[trigger] = PLAYER
+            bounce_active |= trigger
+
+        # Continue bounce betting
+        next_bet = np.where(bounce_active & continuing, previous, next_bet)
+
+        # Slope-based strategy, only if the bounce strategy did not trigger
+        open_ = next_bet == 0
+        if warm:
+            ago = cumulative[:, i - strategy.slope_2_offset]
+            resistance_guard = (open_ & ~slope_active & (slope_p4 > 0) & (slope_p3 < 0)
+                                & (slope_p4_5 > 0) & (slope_p3_5 < 0))
+            support_guard = (open_ & ~slope_active & ~resistance_guard & (slope_p3 > 0) & (slope_p4 < 0)
+                             & (slope_p3_5 > 0) & (slope_p4_5 < 0))
+            cross_resistance = (resistance_guard & (rsi_p4 - 1 > rsi_p3) & (cwl - resistance >= 3) & (cwl - ago >= 3))
+            cross_support = (support_guard & (rsi_p3 - 1 > rsi_p4) & (cwl <= support - 3) & (cwl - ago <= -3))
+            next_bet[cross_resistance] = PLAYER
+            next_bet[cross_support] = BANKER
+            slope_active |= cross_resistance | cross_support
+        next_bet = np.where(open_ & slope_active & continuing, previous, next_bet)
+
+        # Settle the previous round's bet
+        settled = continuing & (result != TIE)
+        won = settled & (result == previous)
+        lost = settled & ~won
+        stake = next_bet_size
+        B = np.where(won, B + np.where(result == BANKER, 0.95 * stake, stake), B)
+        B = np.where(lost, B - stake, B)
+        next_bet_size = np.where(won, growth[np.minimum(consecutive_wins, 3)] * multiplier,
+                                 np.where(lost, base, next_bet_size))
+        consecutive_wins = np.where(won, consecutive_wins + 1, np.where(lost, 0, consecutive_wins))
+        consecutive_losses = np.where(won, 0, consecutive_losses + lost)
+        wins_total = wins_total + won - lost
+
+        # Stopping conditions
+        limits = (wins_total >= 3) | (consecutive_losses >= 2) | (B >= B_high) | (B <= B_low)
+        stop = bounce_active & (((rsi_p4 <= rsi_p3) & (next_bet == PLAYER)) | (cwl >= resistance) | limits)
+        bounce_active = bounce_active & ~stop
+        stop_again = bounce_active & (((rsi_p3 <= rsi_p4) & (next_bet == BANKER)) | (cwl <= support) | limits)
+        bounce_active = bounce_active & ~stop_again
+        slope_player = slope_active & (next_bet == PLAYER) & (rsi_p3 >= rsi_p4)
+        slope_banker = slope_active & ~slope_player & (next_bet == BANKER) & (rsi_p3 <= rsi_p4)
+        slope_stop = slope_player | slope_banker | (slope_active & ~slope_player & ~slope_banker & limits)
+        slope_active = slope_active & ~slope_stop
+        next_bet_size = np.where(stop | stop_again | slope_stop, base, next_bet_size)
+
+        previous = next_bet
+        decisions[:, i] = next_bet
+        bet_sizes[:, i] = np.where(next_bet == 0, 0, next_bet_size)
+        bankroll[:, i] = B
+    return decisions, bet_sizes, bankroll
+
+
+def _play(codes, columns, params):
+    names = decode_results(codes).tolist()
+    cols = {name: values.tolist() for name, values in columns.items()}
+    decisions, bet_sizes, bankroll = simulate(names, cols, params)
+
+    columns['round_num'] = np.arange(1, len(names) + 1)
+    columns['result'] = names
+    columns['next_rd_decision'] = decisions
+    columns['profit'] = np.array(bankroll, dtype=np.float64)
+    columns['下注'] = np.array(bet_sizes, dtype=np.float64)
+    return columns
+
+
+# Same as strategy_columns, as a DataFrame laid out like the app's game frame
+def run_strategy(results, params=DEFAULT_PARAMS):
+    return pd.DataFrame(strategy_columns(results, params), columns=FRAME_COLUMNS)
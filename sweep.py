@@ -0,0 +1,196 @@
+import argparse
+import itertools
+import os
+import random
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from backtest import iter_shoes
+from indicators import decode_results, encode_results, indicator_columns
+from strategy import DEFAULT_PARAMS, LOOKBACK_COLUMNS, StrategyParams, check_params, simulate
+
+
+# Every combination of the listed values, e.g. {'multiplier': [2, 2.2]};
+# parameters that are not listed keep their defaults. Raises ValueError if a
+# combination fails check_params().
+def param_grid(grid):
+    names = list(grid)
+    return [check_params(DEFAULT_PARAMS._replace(**dict(zip(names, values))))
+            for values in itertools.product(*(grid[name] for name in names))]
+
+
+# `n` random combinations. Each parameter is either a list of values to pick
+# from or a (low, high) tuple sampled uniformly (integers for int parameters).
+# Raises ValueError if a combination fails check_params().
+def sample_params(space, n, seed=None):
+    rng = random.Random(seed)
+    combos = []
+    for _ in range(n):
+        values = {}
+        for name, choices in space.items():
+            if isinstance(choices, tuple):
+                low, high = choices
+                if isinstance(getattr(DEFAULT_PARAMS, name), int):
+                    values[name] = rng.randint(int(low), int(high))
+                else:
+                    values[name] = rng.uniform(low, high)
+            else:
+                values[name] = rng.choice(choices)
+        combos.append(check_params(DEFAULT_PARAMS._replace(**values)))
+    return combos
+
+
+# The corpus as NumPy blocks, one group per shoe length: the shoes' positions
+# in the input, their result codes (shoes x rounds, int8) and, per rsi_window,
+# the columns Strategy.step() reads (LOOKBACK_COLUMNS x shoes x rounds,
+# float64). Only rsi_window changes the indicators, so they are computed once
+# per distinct window, in one 2-D pass per length, and shared by every
+# combination that uses it.
+def precompute(shoes, rsi_windows):
+    by_length = {}
+    for position, shoe in enumerate(shoes):
+        by_length.setdefault(len(shoe), []).append(position)
+    codes = [encode_results(shoe) for shoe in shoes]
+    corpus = {}
+    for length, positions in by_length.items():
+        block = np.stack([codes[k] for k in positions]) if length else np.zeros((len(positions), 0), dtype=np.int8)
+        group = corpus[length] = {'positions': np.array(positions), 'codes': block}
+        for window in sorted(set(rsi_windows)):
+            columns = indicator_columns(block, rsi_window=window)
+            group[window] = np.stack([columns[name].astype(np.float64) for name in LOOKBACK_COLUMNS])
+    return corpus
+
+
+# Final bankroll, drawdown and bet counts of one combination over the corpus.
+# Each shoe's columns become plain lists only while it is simulated.
+def evaluate(params, corpus=None):
+    corpus = corpus if corpus is not None else _corpus
+    outcomes = []
+    for group in corpus.values():
+        names = decode_results(group['codes'])
+        block = group[params.rsi_window]
+        for row, position in enumerate(group['positions']):
+            cols = {name: block[j, row].tolist() for j, name in enumerate(LOOKBACK_COLUMNS)}
+            decisions, _, bankroll = simulate(names[row].tolist(), cols, params)
+            if not bankroll:
+                continue
+            bankroll = np.array(bankroll)
+            drawdown = (np.maximum.accumulate(bankroll) - bankroll).max()
+            outcomes.append((position, bankroll[-1], drawdown, len(decisions) - decisions.count('No Bet'),
+                             len(decisions)))
+
+    # In input order, so the totals add up in the same order as shoe by shoe
+    outcomes.sort(key=lambda outcome: outcome[0])
+    finals = [outcome[1] for outcome in outcomes]
+    drawdowns = [outcome[2] for outcome in outcomes]
+    bets = sum(outcome[3] for outcome in outcomes)
+    rounds = sum(outcome[4] for outcome in outcomes)
+
+    finals = np.array(finals)
+    return {
+        **params._asdict(),
+        'shoes': len(finals),
+        'rounds': rounds,
+        'bet_decisions': bets,
+        'mean_final_bankroll': finals.mean() if len(finals) else np.nan,
+        'total_pnl': (finals - params.initial_bankroll).sum(),
+        'mean_max_drawdown': np.mean(drawdowns) if drawdowns else np.nan,
+        'max_drawdown': max(drawdowns, default=np.nan),
+    }
+
+
+# Corpus of the current worker process, set once by the pool initializer
+_corpus = None
+
+
+# Write every block of `corpus` to `directory`; returns the same layout with
+# file paths in place of the blocks
+def _save_corpus(corpus, directory):
+    layout = {}
+    for length, group in corpus.items():
+        layout[length] = {}
+        for key, block in group.items():
+            path = os.path.join(directory, f'{length}-{key}.npy')
+            np.save(path, block)
+            layout[length][key] = path
+    return layout
+
+
+# Workers map the saved blocks instead of each receiving a pickled copy, so
+# the corpus is held once in the page cache whatever the number of processes
+def _init_worker(layout):
+    global _corpus
+    _corpus = {length: {key: np.load(path, mmap_mode='r') for key, path in files.items()}
+               for length, files in layout.items()}
+
+
+# Evaluate every combination over the shoes with a process pool
+def run_sweep(shoes, combos, processes=None):
+    corpus = precompute(shoes, [params.rsi_window for params in combos])
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        rows = [evaluate(params, corpus) for params in combos]
+    else:
+        chunksize = max(1, len(combos) // (processes * 4))
+        with tempfile.TemporaryDirectory(prefix='sweep-') as directory:
+            layout = _save_corpus(corpus, directory)
+            with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(layout,)) as pool:
+                rows = list(pool.map(evaluate, combos, chunksize=chunksize))
+    return pd.DataFrame(rows)
+
+
+# Parse `name=v1,v2,...` (values) or `name=low:high` (range) options
+def _parse_space(specs):
+    space = {}
+    for spec in specs:
+        name, _, values = spec.partition('=')
+        if name not in StrategyParams._fields:
+            raise ValueError(f"unknown parameter {name!r}; choose from {', '.join(StrategyParams._fields)}")
+        cast = type(getattr(DEFAULT_PARAMS, name))
+        if ':' in values:
+            low, high = values.split(':')
+            space[name] = (cast(low), cast(high))
+        else:
+            space[name] = [cast(value) for value in values.split(',')]
+    return space
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep strategy parameters over a corpus of recorded shoes.")
+    parser.add_argument('files', nargs='+', help="CSV or Parquet files, one row per round")
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=VALUES',
+                        help="values as v1,v2,... or a low:high range for --samples (repeatable)")
+    parser.add_argument('--samples', type=int, help="evaluate this many random combinations instead of the full grid")
+    parser.add_argument('--seed', type=int, help="random seed for --samples")
+    parser.add_argument('--processes', type=int, help="worker processes (default: all cores)")
+    parser.add_argument('--shoe-column', default='shoe')
+    parser.add_argument('--result-column', default='result')
+    parser.add_argument('--out', metavar='CSV', help="write every combination's results to this CSV file")
+    parser.add_argument('--top', type=int, default=10, help="combinations to print, best total P&L first")
+    args = parser.parse_args(argv)
+
+    try:
+        space = _parse_space(args.param)
+    except ValueError as e:
+        parser.error(str(e))
+    if not args.samples and any(isinstance(values, tuple) for values in space.values()):
+        parser.error("low:high ranges need --samples")
+    try:
+        combos = sample_params(space, args.samples, args.seed) if args.samples else param_grid(space)
+    except ValueError as e:
+        parser.error(str(e))
+
+    shoes = [results for path in args.files
+             for _, results in iter_shoes(path, args.shoe_column, args.result_column)]
+    df = run_sweep(shoes, combos, args.processes)
+
+    if args.out:
+        df.to_csv(args.out, index=False)
+    print(df.sort_values('total_pnl', ascending=False).head(args.top).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
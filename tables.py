@@ -0,0 +1,92 @@
+import threading
+
+import numpy as np
+
+from cache import IndicatorCache
+from engine import GameEngine
+from history import history_page
+from strategy import DEFAULT_PARAMS
+
+
+# Table names are written into journal lines ("G1 12 P"), so a name must be
+# one word of printable ASCII
+def check_game(game):
+    if not (isinstance(game, str) and game and game.isascii() and game.isprintable() and ' ' not in game):
+        raise ValueError(f"invalid game {game!r}; expected a name such as G1, without spaces")
+    return game
+
+
+# Every table of the process: one GameEngine per game, shared by all sessions
+# playing it, and the journal they write to. Only the next round is accepted,
+# so operators entering the same round cannot interleave their roads; the
+# first one counts and the others are told. Streamlit runs sessions in
+# threads, so every call holds the lock.
+class GameTables:
+    def __init__(self, journal=None, params=DEFAULT_PARAMS):
+        self.journal = journal
+        self.params = params
+        self.engines = {}
+        self.cache = IndicatorCache()
+        self.lock = threading.RLock()
+
+    # Engine of `game`, restored from the journal the first time
+    def engine(self, game):
+        with self.lock:
+            engine = self.engines.get(game)
+            if engine is None:
+                check_game(game)
+                road = self.journal.road(game) if self.journal is not None else ''
+                engine = self.engines[game] = GameEngine.from_results(road, self.params, game)
+            return engine
+
+    def state(self, game):
+        with self.lock:
+            return {'game': game, **self.engine(game).state()}
+
+    # Add `result` as round `round_num`; False if that is not the next round
+    # (someone else entered it first)
+    def apply(self, game, round_num, result):
+        with self.lock:
+            engine = self.engine(game)
+            if round_num != len(engine) + 1:
+                return False
+            engine.push(result)
+            if self.journal is not None:
+                self.journal.append(game, round_num, result)
+            return True
+
+    def reset(self, game):
+        check_game(game)
+        with self.lock:
+            self.engines[game] = GameEngine(self.params, game)
+            if self.journal is not None:
+                self.journal.reset(game)
+
+    # Replace the road of `game` with a whole shoe of result codes (or, with
+    # replace=False, continue it), built in one bulk pass. The shoe must
+    # have at least one round; Reset clears a table.
+    def load(self, game, codes, replace=True):
+        check_game(game)
+        if len(codes) == 0:
+            # An empty replace would wipe the table for every session
+            raise ValueError("nothing to import: the shoe has no rounds")
+        with self.lock:
+            results = codes if replace else np.concatenate([self.engine(game).store.column('result'), codes])
+            self.engines[game] = GameEngine.from_results(results, self.params, game)
+            if self.journal is not None:
+                self.journal.load(game, codes, replace)
+
+    # One page of the history table, built once per round
+    def history(self, game, page, page_size):
+        with self.lock:
+            engine = self.engine(game)
+            return self.cache.view(game, engine, ('history', page, page_size),
+                                   lambda: history_page(engine.store, page, page_size))
+
+    # Branches of the next `depth` rounds, computed once per round and depth
+    def what_if(self, game, depth):
+        from whatif import what_if
+
+        with self.lock:
+            engine = self.engine(game)
+            return self.cache.view(game, engine, ('whatif', depth), lambda: what_if(engine, depth))
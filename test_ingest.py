@@ -0,0 +1,62 @@
+import io
+
+import pytest
+
+from indicators import BANKER, PLAYER, TIE
+from ingest import parse_road, read_results_csv
+
+
+def test_parse_road():
+    assert parse_road('BPpT').tolist() == [BANKER, PLAYER, PLAYER, TIE]
+
+
+def test_parse_road_ignores_separators():
+    assert parse_road('B P,T;b-p|t/\r\n\tB').tolist() == [BANKER, PLAYER, TIE, BANKER, PLAYER, TIE, BANKER]
+
+
+def test_parse_road_empty():
+    assert parse_road('').tolist() == []
+    assert parse_road(' ,\n').tolist() == []
+
+
+def test_parse_road_reports_the_bad_letter():
+    with pytest.raises(ValueError, match=r"unexpected 'X' at result 3; use B, P and T"):
+        parse_road('BP XB')
+
+
+def test_parse_road_counts_from_offset():
+    with pytest.raises(ValueError, match=r"unexpected '7' at result 102"):
+        parse_road('B7', offset=100)
+
+
+def test_parse_road_non_latin_text():
+    with pytest.raises(ValueError, match=r"unexpected '\?' at result 2"):
+        parse_road('B→P')
+
+
+def test_read_results_csv():
+    file = io.StringIO('round,result\n1,Banker\n2, player \n3,T\n4,p\n')
+    assert read_results_csv(file).tolist() == [BANKER, PLAYER, TIE, PLAYER]
+
+
+def test_read_results_csv_other_column():
+    file = io.StringIO('winner\nB\nTie\n')
+    assert read_results_csv(file, 'winner').tolist() == [BANKER, TIE]
+
+
+def test_read_results_csv_reports_the_bad_row():
+    file = io.StringIO('result\nBanker\nPlayer\nDragon\n')
+    with pytest.raises(ValueError, match=r"unexpected result 'Dragon' in row 3"):
+        read_results_csv(file)
+
+
+def test_read_results_csv_reports_an_empty_value():
+    file = io.StringIO('round,result\n1,Banker\n2,\n')
+    with pytest.raises(ValueError, match=r"unexpected result '' in row 2"):
+        read_results_csv(file)
+
+
+def test_read_results_csv_missing_column():
+    file = io.StringIO('winner\nBanker\n')
+    with pytest.raises(ValueError):
+        read_results_csv(file, 'result')
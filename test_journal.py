@@ -0,0 +1,122 @@
+import os
+
+from journal import Journal
+
+
+def _segments(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith('segment-'))
+
+
+def _snapshots(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith('snapshot-'))
+
+
+def _reopen(journal):
+    journal.close()
+    return Journal(journal.directory)
+
+
+def test_roads_survive_a_restart(tmp_path):
+    journal = Journal(str(tmp_path))
+    for round_num, result in enumerate(['Banker', 'Player', 'Tie'], 1):
+        journal.append('G1', round_num, result)
+    journal.append('G2', 1, 'Player')
+
+    journal = _reopen(journal)
+    assert journal.road('G1') == 'BPT'
+    assert journal.road('G2') == 'P'
+    assert journal.road('G3') == ''
+    journal.close()
+
+
+def test_torn_final_line_is_ignored(tmp_path):
+    journal = Journal(str(tmp_path))
+    journal.append('G1', 1, 'Banker')
+    journal.append('G1', 2, 'Player')
+    journal.close()
+    with open(os.path.join(str(tmp_path), _segments(str(tmp_path))[-1]), 'a', encoding='ascii') as f:
+        f.write('G1 3 T')
+
+    journal = Journal(str(tmp_path))
+    assert journal.road('G1') == 'BP'
+    # New events go to a fresh segment, never after the torn tail
+    journal.append('G1', 3, 'Banker')
+    journal = _reopen(journal)
+    assert journal.road('G1') == 'BPB'
+    journal.close()
+
+
+def test_snapshot_plus_later_segments(tmp_path):
+    journal = Journal(str(tmp_path), snapshot_every=4)
+    results = ['Banker', 'Player', 'Player', 'Tie', 'Banker', 'Banker']
+    for round_num, result in enumerate(results, 1):
+        journal.append('G1', round_num, result)
+    journal.close()
+
+    # One snapshot after four events; only the segments after it are kept
+    assert len(_snapshots(str(tmp_path))) == 1
+    assert len(_segments(str(tmp_path))) == 1
+    journal = Journal(str(tmp_path), snapshot_every=4)
+    assert journal.road('G1') == 'BPPTBB'
+    journal.close()
+
+
+def test_unreadable_snapshot_falls_back_to_segments(tmp_path):
+    journal = Journal(str(tmp_path), snapshot_every=1000)
+    journal.append('G1', 1, 'Player')
+    journal.close()
+    with open(os.path.join(str(tmp_path), 'snapshot-00000005.json'), 'w', encoding='ascii') as f:
+        f.write('{"games": ')
+
+    journal = Journal(str(tmp_path))
+    assert journal.road('G1') == 'P'
+    journal.close()
+
+
+def test_reset_events(tmp_path):
+    journal = Journal(str(tmp_path))
+    journal.append('G1', 1, 'Banker')
+    journal.append('G1', 2, 'Banker')
+    journal.append('G2', 1, 'Tie')
+    journal.reset('G1')
+    assert journal.road('G1') == ''
+    journal.append('G1', 1, 'Player')
+
+    journal = _reopen(journal)
+    assert journal.road('G1') == 'P'
+    assert journal.road('G2') == 'T'
+    journal.close()
+
+
+def test_load_replaces_or_continues_a_road(tmp_path):
+    journal = Journal(str(tmp_path))
+    journal.append('G1', 1, 'Tie')
+    journal.load('G1', 'BPB')
+    assert journal.road('G1') == 'BPB'
+    journal.load('G1', [1, 0], replace=False)
+
+    journal = _reopen(journal)
+    assert journal.road('G1') == 'BPBPT'
+    journal.close()
+
+
+def test_out_of_order_rounds_are_dropped(tmp_path):
+    journal = Journal(str(tmp_path))
+    journal.append('G1', 1, 'Banker')
+    journal.append('G1', 1, 'Player')  # same round from another session
+    journal.append('G1', 3, 'Tie')  # skips round 2
+    journal.append('G1', 2, 'Player')
+    assert journal.road('G1') == 'BP'
+
+    journal = _reopen(journal)
+    assert journal.road('G1') == 'BP'
+    journal.close()
+
+
+def test_malformed_lines_are_skipped(tmp_path):
+    with open(os.path.join(str(tmp_path), 'segment-00000001.log'), 'w', encoding='ascii') as f:
+        f.write('G1 1 B\nG 1 2 P\nG1 x P\nG1 2 Q\nG1 2 P\n')
+
+    journal = Journal(str(tmp_path))
+    assert journal.road('G1') == 'BP'
+    journal.close()
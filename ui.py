@@ -0,0 +1,258 @@
+import os
+
+import pandas as pd
+import streamlit as st
+
+from history import PAGE_SIZES, page_count
+from metrics import metrics
+
+
+# Page pieces of the app. Streamlit re-executes app.py on every interaction,
+# but this module (and the tables behind it) is imported once per process, so
+# a rerun only calls these functions. Modules that only some setups need (the
+# game server client, the local tables and their journal, the import parsers,
+# the what-if panel) are imported when first used.
+
+GAMES = ["G1", "G2", "G3", "G4", "G5", "G6"]
+
+# Stage timings can be exported to METRICS_FILE (.prom for Prometheus text,
+# JSON otherwise) and, with METRICS_PORT set, served on localhost
+METRICS_FILE = os.environ.get('METRICS_FILE', 'metrics.prom')
+
+# Custom CSS to adjust button sizes and reduce spacing
+CSS = """
+    <style>
+    /* Reduce padding and margins of buttons */
+    .stButton button {
+        height: 40px;
+        width: 80px;
+        margin: 1px;
+        padding: 0px;
+        font-size: 16px;
+    }
+    /* Center the main container */
+    .main .block-container {
+        padding-top: 0.5rem;
+        padding-bottom: 0.5rem;
+        padding-left: 0.5rem;
+        padding-right: 0.5rem;
+        max-width: 100%;
+    }
+    </style>
+    """
+
+
+def inject_css():
+    st.markdown(CSS, unsafe_allow_html=True)
+
+
+# With GAME_SERVER set (unix:/path/to.sock or host:port, see server.py) the
+# tables live in the shared game server: this session only sends results and
+# shows the state the server pushes, so each round is computed once per table
+@st.cache_resource
+def get_game_client():
+    address = os.environ.get('GAME_SERVER')
+    if not address:
+        return None
+    from server import GameClient
+
+    client = GameClient(address)
+    client.subscribe(GAMES)
+    return client
+
+
+# Without a game server the tables live in this process: one engine per game
+# shared by every session, with the same next-round check as the server, and
+# an on-disk journal so tables survive restarts and reconnects
+@st.cache_resource
+def get_tables():
+    from journal import Journal
+    from tables import GameTables
+
+    return GameTables(Journal(os.environ.get('JOURNAL_DIR', 'journal')))
+
+
+@st.cache_resource
+def start_metrics_server():
+    port = os.environ.get('METRICS_PORT')
+    return metrics.serve(int(port)) if port else None
+
+
+# Session state of a table as reported by GameEngine.state() or the server
+def set_table_state(game, state):
+    st.session_state[f'cumulative_wins_{game}'] = state['cumulative_wins']
+    st.session_state[f'round_num_{game}'] = state['round_num']
+    st.session_state[f'proportions_{game}'] = state['proportions']
+    st.session_state[f'profit_{game}'] = state['profit']
+
+
+# Initialize session state for cumulative wins, round number, proportions, decisions, and profits
+def init_table(game):
+    start_metrics_server()
+    # The shared table is authoritative; take its latest state on every rerun,
+    # as other sessions may have entered rounds since
+    client = get_game_client()
+    if client is not None:
+        set_table_state(game, client.latest.get(game) or client.state(game))
+    else:
+        set_table_state(game, get_tables().state(game))
+
+    if f'initial_bankroll_{game}' not in st.session_state:
+        st.session_state[f'initial_bankroll_{game}'] = 5000
+
+
+# Enter `winner` as round `round_num`, the round the operator was shown when
+# they clicked (bound when the buttons were drawn, as init_table has already
+# moved the session to the table's latest round by the time a click is
+# handled). If another screen entered that round first nothing is recorded
+# and render_controls says so; either way the session then shows the table's
+# current state.
+def update_result(game, winner, round_num):
+    client = get_game_client()
+    with metrics.timer(game, 'update_result'):
+        if client is not None:
+            accepted, state = client.result(game, round_num, winner)
+        else:
+            tables = get_tables()
+            accepted = tables.apply(game, round_num, winner)
+            state = tables.state(game)
+    set_table_state(game, state)
+    if not accepted:
+        st.session_state[f'rejected_{game}'] = (round_num, winner)
+    return accepted
+
+
+def reset_game(game):
+    client = get_game_client()
+    if client is not None:
+        set_table_state(game, client.reset(game))
+        return
+    tables = get_tables()
+    tables.reset(game)
+    set_table_state(game, tables.state(game))
+
+
+# Import a whole shoe at once: one bulk pass instead of a rerun per result
+def import_results(game, codes, replace):
+    client = get_game_client()
+    if client is not None:
+        set_table_state(game, client.load(game, codes, replace))
+        return
+    tables = get_tables()
+    tables.load(game, codes, replace)
+    set_table_state(game, tables.state(game))
+
+
+def render_controls(game):
+    st.markdown(f"""
+    <h4 style='font-size:18px;'>Game {game}: Who Won Round {st.session_state[f'round_num_{game}']}?</h4>
+""", unsafe_allow_html=True)
+    # Buttons for each round (Banker, Player, Tie). A click is handled before
+    # the next rerun, for the round shown here.
+    round_num = st.session_state[f'round_num_{game}']
+    for column, winner in zip(st.columns(3), ("Banker", "Player", "Tie")):
+        with column:
+            st.button(winner, on_click=update_result, args=(game, winner, round_num))
+    rejected = st.session_state.pop(f'rejected_{game}', None)
+    if rejected is not None:
+        st.write(f"**Round {rejected[0]} was already entered at another screen; "
+                 f"{rejected[1]} was not recorded.**")
+
+    # Button to reset the game
+    if st.button("Reset Game"):
+        reset_game(game)
+        st.write(f"**Game {game} reset successfully!**")
+
+
+def render_import(game):
+    with st.expander("Import shoe"):
+        road = st.text_area("Road, e.g. BPPTBB", key=f'road_{game}')
+        upload = st.file_uploader("or a CSV file with one round per row", type='csv', key=f'upload_{game}')
+        result_column = st.text_input("CSV result column", value='result', key=f'result_column_{game}')
+        replace = st.radio("Mode", ["Replace game", "Append"], key=f'import_mode_{game}') == "Replace game"
+        if st.button("Import"):
+            from ingest import parse_road, read_results_csv
+
+            try:
+                codes = read_results_csv(upload, result_column) if upload is not None else parse_road(road)
+                if len(codes) == 0:
+                    raise ValueError("no rounds to import; enter a road or choose a file")
+            except ValueError as e:
+                st.write(f"**Import failed:** {e}")
+            else:
+                import_results(game, codes, replace)
+                st.write(f"**Imported {len(codes)} rounds into {game}.**")
+
+
+# Decision, bet size and support/resistance for every outcome of the next
+# rounds, computed on forks of the engine once per round and depth
+def render_what_if(game):
+    with st.expander("What if"):
+        if not st.checkbox("Evaluate next rounds", key=f'what_if_{game}'):
+            return
+        from whatif import MAX_DEPTH, what_if_frame
+
+        depth = st.number_input("Rounds ahead", min_value=1, max_value=MAX_DEPTH, value=1, key=f'what_if_depth_{game}')
+        with metrics.timer(game, 'what_if', 3 ** depth):
+            client = get_game_client()
+            branches = (client or get_tables()).what_if(game, depth)
+            st.write(what_if_frame(branches))
+
+
+# Display current betting decisions and profits
+def render_history(game):
+    rounds = st.session_state[f'round_num_{game}'] - 1
+    if rounds <= 0:
+        return
+
+    st.markdown(f"""
+    <h4 style='font-size:18px;'>Betting Decisions and Data for {game}?</h4>
+""", unsafe_allow_html=True)
+
+    # Display cumulative wins and proportions
+    wins = st.session_state[f'cumulative_wins_{game}']
+    proportions = st.session_state[f'proportions_{game}']
+    st.write(f"**P:** {wins['Player']} | "
+             f"**B:** {wins['Banker']} | "
+             f"**T:** {wins['Tie']} | "
+             f"**P3:** {proportions['proportion_3']:.2f} | "
+             f"**P4:** {proportions['proportion_4']:.2f}")
+
+    # Only the requested page of the history is materialized and sent
+    col_rows, col_page = st.columns(2)
+    with col_rows:
+        page_size = st.selectbox("Rows", PAGE_SIZES, index=1, key=f'page_size_{game}')
+    pages = page_count(rounds, page_size)
+    page = 0
+    if pages > 1:
+        with col_page:
+            page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=f'page_{game}') - 1
+
+    with metrics.timer(game, 'render', min(page_size, rounds)):
+        client = get_game_client()
+        display_df = (client or get_tables()).history(game, page, page_size)
+        st.write(display_df)
+
+
+# Optional per-stage timings for the current game. Collecting them is switched
+# on for the whole process with GAME_METRICS=1; the checkbox only shows them
+# in this session.
+def render_timings(game):
+    with st.sidebar:
+        if not st.checkbox("Stage timings", key='show_timings'):
+            return
+        if not metrics.enabled:
+            st.write("Timings are not being collected; start the app with GAME_METRICS=1.")
+            return
+        stages = metrics.snapshot(game)
+        if stages:
+            timings = pd.DataFrame(stages).drop(columns='game').set_index('stage')
+            timings['mean_ms'] = timings['seconds'] / timings['calls'] * 1e3
+            timings['last_ms'] = timings['last_seconds'] * 1e3
+            st.write(timings[['calls', 'rows', 'mean_ms', 'last_ms', 'seconds']])
+        else:
+            st.write("No timings yet for this game.")
+        if st.button("Export timings"):
+            st.write(f"Written to {metrics.export(METRICS_FILE)}")
+        if st.button("Clear timings"):
+            metrics.reset(game)
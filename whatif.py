@@ -0,0 +1,47 @@
+import pandas as pd
+
+from history import DISPLAY_COLUMNS
+from indicators import RESULT_CODES, RESULT_PROBABILITIES
+
+
+# Outcomes tried for each round, in the order of the app's buttons
+OUTCOMES = ('Banker', 'Player', 'Tie')
+
+# Deepest tree evaluated: 3 + 9 + ... + 729 = 1092 branches
+MAX_DEPTH = 6
+
+# Row columns reported for every branch
+BRANCH_COLUMNS = ['round_num', 'next_rd_decision', '下注', 'support', 'resistance', 'Cumulative Wins/Losses', 'profit']
+
+
+# What the next `depth` rounds would show for every sequence of outcomes: one
+# dict per branch (3 + 9 + ... + 3^depth), with its path of P/B/T initials,
+# its probability at the long-run frequencies and its last round's decision,
+# bet size, support/resistance and bankroll, ordered so each branch is
+# followed by its children. Branches are forks of the engine (see
+# GameEngine.fork()) expanded a level at a time; a node's last outcome reuses
+# the node's own snapshot, and the live engine is never touched.
+def what_if(engine, depth=1):
+    if not 1 <= depth <= MAX_DEPTH:
+        raise ValueError(f"depth must be between 1 and {MAX_DEPTH}")
+    branches = []
+    frontier = [('', 1.0, engine.fork())]
+    for level in range(1, depth + 1):
+        expanded = []
+        for path, probability, node in frontier:
+            for k, outcome in enumerate(OUTCOMES):
+                child = node if k == len(OUTCOMES) - 1 else node.fork()
+                row = child.step(outcome)
+                child_path = path + outcome[0]
+                child_probability = probability * RESULT_PROBABILITIES[RESULT_CODES[outcome]]
+                branches.append({'path': child_path, 'depth': level, 'probability': child_probability,
+                                 **{name: row[name] for name in BRANCH_COLUMNS}})
+                expanded.append((child_path, child_probability, child))
+        frontier = expanded
+    return sorted(branches, key=lambda branch: branch['path'])
+
+
+# Branches as a table with the history's display names
+def what_if_frame(branches):
+    df = pd.DataFrame(branches, columns=['path', 'probability'] + BRANCH_COLUMNS)
+    return df.rename(columns={'path': 'If', 'probability': 'Prob', **DISPLAY_COLUMNS})